@@ -0,0 +1,54 @@
+from posts import images
+from posts.thumbnails import get_ready_thumbnail
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _thumbnail(post):
+    thumbnail = get_ready_thumbnail(post.image)
+    return thumbnail.url if thumbnail else None
+
+
+def _srcset(post):
+    if not images.get_variants(post.image.name):
+        return None
+    return {ext: images.srcset(post.image.name, ext)
+            for ext in ('webp', 'jpg')}
+
+
+# Поле ответа и функция, которая его считает. Поля, не попавшие
+# в ?fields=, не вычисляются вовсе.
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: _isoformat(post.pub_date),
+    'updated_at': lambda post: _isoformat(post.updated_at),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'thumbnail': _thumbnail,
+    'srcset': _srcset,
+    'comment_count': lambda post: post.comment_count,
+}
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: _isoformat(comment.created),
+}
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'title': lambda group: group.title,
+    'slug': lambda group: group.slug,
+    'description': lambda group: group.description,
+}
+FOLLOW_FIELDS = {
+    'author': lambda follow: follow.author.username,
+}
+
+
+def serialize(obj, getters, fields=None):
+    return {name: getters[name](obj) for name in fields or getters}
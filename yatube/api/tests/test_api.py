@@ -0,0 +1,181 @@
+import json
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.caches import VERSION_KEY
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {i}', group=self.group)
+            for i in range(5)
+        ]
+        self.guest = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def send(self, client, method, address, data):
+        return getattr(client, method)(
+            address, json.dumps(data), content_type='application/json')
+
+    def test_list_follows_cursor_without_duplicates(self):
+        address = reverse('api:posts') + '?limit=2'
+        seen = []
+        while address:
+            response = self.guest.get(address)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 2)
+            seen.extend(item['id'] for item in data['results'])
+            address = data['next']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_broken_cursor_rejected(self):
+        response = self.guest.get(reverse('api:posts') + '?cursor=xxx')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields(self):
+        post = self.posts[0]
+        address = reverse('api:post_detail', args=[post.pk])
+        response = self.guest.get(address + '?fields=id,author')
+        self.assertEqual(response.json(), {'id': post.pk, 'author': 'auth'})
+        response = self.guest.get(address + '?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['fields'], ['password'])
+
+    def test_unchanged_list_not_modified(self):
+        address = reverse('api:posts')
+        etag = self.guest.get(address)['ETag']
+        response = self.guest.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        response = self.guest.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_reports_missing(self):
+        ids = [self.posts[0].pk, 999, self.posts[1].pk]
+        address = reverse('api:posts_batch') + '?ids=' + ','.join(
+            map(str, ids))
+        # ETag ищет существующие id, ответ - сами посты.
+        with self.assertNumQueries(2):
+            data = self.guest.get(address).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [self.posts[0].pk, self.posts[1].pk])
+        self.assertEqual(data['missing'], [999])
+        response = self.guest.get(reverse('api:posts_batch') + '?ids=a')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_etag_skips_missing_ids(self):
+        address = reverse('api:posts_batch') + f'?ids={self.posts[0].pk},a'
+        self.assertEqual(self.guest.get(address).status_code, 400)
+        address = reverse('api:posts_batch') + f'?ids={self.posts[0].pk},999'
+        etag = self.guest.get(address)['ETag']
+        self.assertIsNone(cache.get(VERSION_KEY.format('post:999')))
+        self.assertEqual(
+            self.guest.get(address, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.posts[1].delete()
+        self.assertEqual(
+            self.guest.get(address, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.posts[0].delete()
+        self.assertEqual(
+            self.guest.get(address, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_create_requires_login(self):
+        data = {'text': 'Новый пост', 'group': 'group'}
+        response = self.send(self.guest, 'post', reverse('api:posts'), data)
+        self.assertEqual(response.status_code, 401)
+        response = self.send(
+            self.author_client, 'post', reverse('api:posts'), data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['group'], 'group')
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+
+    def test_only_author_modifies_post(self):
+        post = self.posts[0]
+        address = reverse('api:post_detail', args=[post.pk])
+        response = self.send(
+            self.reader_client, 'patch', address, {'text': 'Чужая правка'})
+        self.assertEqual(response.status_code, 403)
+        response = self.send(
+            self.author_client, 'patch', address, {'text': 'Правка'})
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.group, self.group)
+        response = self.author_client.patch(
+            address, urlencode({'text': 'Правка формой'}),
+            content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка формой')
+        response = self.author_client.patch(
+            address, 'text', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        response = self.author_client.delete(address)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_comments(self):
+        address = reverse('api:comments', args=[self.posts[0].pk])
+        response = self.send(
+            self.reader_client, 'post', address, {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 201)
+        results = self.guest.get(address).json()['results']
+        self.assertEqual(
+            [(item['author'], item['text']) for item in results],
+            [('reader', 'Комментарий')])
+
+    def test_follow_and_unfollow(self):
+        address = reverse('api:follows')
+        response = self.send(
+            self.reader_client, 'post', address, {'author': 'auth'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        feed = self.reader_client.get(reverse('api:feed')).json()
+        self.assertEqual(len(feed['results']), len(self.posts))
+        response = self.reader_client.delete(
+            reverse('api:unfollow', args=['auth']))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+
+    def test_errors_are_json(self):
+        response = self.guest.get(reverse('api:post_detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+        response = self.guest.put(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, POST')
+
+    def test_csrf_failure_is_json_403(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = self.send(
+            client, 'post', reverse('api:posts'), {'text': 'Без токена'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', response.json()['detail'])
+        # Страницы сайта по-прежнему отвечают HTML, но тоже с 403.
+        response = client.post(reverse('posts:post_create'), {'text': 'x'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.filter(text='Без токена').exists())
@@ -0,0 +1,338 @@
+import functools
+import json
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.shortcuts import get_object_or_404
+
+from core.ratelimit import rate_limit
+from core.sqlite import retry_if_locked
+from posts.caches import get_versions
+from posts.etags import (author_of, conditional, group_exists, make_etag,
+                         post_etag)
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+from posts.paginators import keyset_page
+from posts.timelines import TIMELINE_ORDER, timeline_posts
+
+from .serializers import (COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS,
+                          POST_FIELDS, serialize)
+
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.body = {'detail': detail, **extra}
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(*methods):
+    """Разрешённые методы и ошибки в виде JSON вместо HTML-страниц."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = json_response(
+                    {'detail': 'Метод не поддерживается.'}, 405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return json_response(error.body, error.status)
+            except Http404:
+                return json_response({'detail': 'Не найдено.'}, 404)
+        return wrapper
+    return decorator
+
+
+def limited(request):
+    return json_response({'detail': 'Слишком много запросов.'}, 429)
+
+
+def require_user(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация.')
+    return request.user
+
+
+def parse_fields(request, getters):
+    """Поля из ?fields=a,b; без параметра - все поля."""
+    value = request.GET.get('fields')
+    if not value:
+        return None
+    fields = [name for name in value.split(',') if name]
+    unknown = set(fields) - set(getters)
+    if unknown:
+        raise ApiError(400, 'Неизвестные поля.', fields=sorted(unknown))
+    return fields
+
+
+def parse_ids(request):
+    """Список id из ?ids=1,2,3, не длиннее MAX_BATCH."""
+    try:
+        ids = [int(pk) for pk in request.GET.get('ids', '').split(',')
+               if pk]
+    except ValueError:
+        raise ApiError(400, 'ids - список чисел через запятую.')
+    if len(ids) > MAX_BATCH:
+        raise ApiError(400, f'Не больше {MAX_BATCH} id за запрос.')
+    return ids
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_ON_PAGE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом.')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def read_data(request):
+    """Тело запроса: JSON-объект или поля формы."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Тело запроса - не JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект.')
+        return data
+    if request.method == 'POST':
+        return request.POST.dict()
+    # Django разбирает формы только у POST, тело PATCH читаем сами.
+    if request.content_type == 'application/x-www-form-urlencoded':
+        return QueryDict(request.body, encoding=request.encoding).dict()
+    raise ApiError(415, 'Ожидается JSON или поля формы.')
+
+
+def paginated(request, queryset, getters, **order):
+    """Страница по курсору без COUNT: ссылка next ведёт на следующую."""
+    fields = parse_fields(request, getters)
+    page = keyset_page(queryset, parse_limit(request),
+                       request.GET.get('cursor'), **order)
+    if page is None:
+        raise ApiError(400, 'Неверный курсор.')
+    items, next_cursor = page
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}')
+    return json_response({
+        'results': [serialize(item, getters, fields) for item in items],
+        'next': next_url,
+    })
+
+
+# Списки постов показывают comment_count, поэтому их ETag зависит ещё
+# и от версии 'comments', которую сдвигает каждый комментарий.
+def posts_etag(request):
+    return make_etag(request, *get_versions('feed', 'comments'))
+
+
+def groups_etag(request):
+    return make_etag(request, *get_versions('feed'))
+
+
+# Для несуществующих группы и поста ETag нет: view ответит 404, а версия
+# их области в кэше не заводится.
+def group_posts_etag(request, slug):
+    if not group_exists(slug):
+        return None
+    return make_etag(request, *get_versions(f'group:{slug}', 'comments'))
+
+
+def comments_etag(request, post_id):
+    if author_of(post_id) is None:
+        return None
+    return make_etag(request, *get_versions(f'post:{post_id}'))
+
+
+def feed_etag(request):
+    viewer = request.user.username if request.user.is_authenticated else ''
+    return make_etag(request, *get_versions(
+        'feed', 'comments', f'profile:{viewer}'))
+
+
+def follows_etag(request):
+    viewer = request.user.username if request.user.is_authenticated else ''
+    return make_etag(request, *get_versions(f'profile:{viewer}'))
+
+
+def batch_etag(request):
+    # Версия поста сдвигается при создании, правке, удалении и комментарии.
+    # Версии заводятся только для существующих постов, а их список входит
+    # в ETag: появление или удаление поста из запроса его меняет.
+    try:
+        ids = parse_ids(request)
+    except ApiError:
+        return None
+    found = sorted(Post.objects.filter(
+        pk__in=ids).values_list('pk', flat=True))
+    return make_etag(request, ','.join(map(str, found)),
+                     *get_versions(*(f'post:{pk}' for pk in found)))
+
+
+def group_id(slug):
+    if not slug:
+        return None
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    if pk is None:
+        raise ApiError(400, 'Группа не найдена.', fields=['group'])
+    return pk
+
+
+@retry_if_locked
+def save_post(request, post, status):
+    data = read_data(request)
+    values = {'text': post.text, 'group': post.group_id}
+    values.update(data)
+    if 'group' in data:
+        values['group'] = group_id(data['group'])
+    form = PostForm(values, request.FILES or None, instance=post)
+    if not form.is_valid():
+        raise ApiError(400, 'Ошибка в данных.', errors=form.errors)
+    return json_response(serialize(form.save(), POST_FIELDS), status)
+
+
+@conditional(posts_etag)
+@api_view('GET', 'POST')
+@rate_limit('post', on_limit=limited)
+def posts(request):
+    if request.method == 'POST':
+        return save_post(request, Post(author=require_user(request)), 201)
+    queryset = Post.objects.for_feed()
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    return paginated(request, queryset, POST_FIELDS)
+
+
+@conditional(post_etag)
+@api_view('GET', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    if request.method == 'GET':
+        return json_response(serialize(
+            post, POST_FIELDS, parse_fields(request, POST_FIELDS)))
+    if require_user(request) != post.author:
+        raise ApiError(403, 'Изменять пост может только автор.')
+    if request.method == 'DELETE':
+        return delete_post(request, post)
+    return save_post(request, post, 200)
+
+
+@retry_if_locked
+def delete_post(request, post):
+    post.delete()
+    return HttpResponse(status=204)
+
+
+@conditional(batch_etag)
+@api_view('GET')
+def posts_batch(request):
+    """Несколько постов по ?ids=1,2,3 одним запросом к базе."""
+    ids = parse_ids(request)
+    fields = parse_fields(request, POST_FIELDS)
+    found = Post.objects.for_feed().in_bulk(ids)
+    return json_response({
+        'results': [serialize(found[pk], POST_FIELDS, fields)
+                    for pk in ids if pk in found],
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
+
+@conditional(comments_etag)
+@api_view('GET', 'POST')
+@rate_limit('comment', on_limit=limited)
+def comments(request, post_id):
+    if request.method == 'POST':
+        return add_comment(request, post_id)
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    queryset = Post(pk=post_id).comments.select_related('author')
+    return paginated(request, queryset, COMMENT_FIELDS, key_field='created')
+
+
+@retry_if_locked
+def add_comment(request, post_id):
+    user = require_user(request)
+    post = get_object_or_404(Post, pk=post_id)
+    form = CommentForm(read_data(request))
+    if not form.is_valid():
+        raise ApiError(400, 'Ошибка в данных.', errors=form.errors)
+    comment = form.save(commit=False)
+    comment.author = user
+    comment.post = post
+    comment.save()
+    return json_response(serialize(comment, COMMENT_FIELDS), 201)
+
+
+@conditional(groups_etag)
+@api_view('GET')
+def groups(request):
+    fields = parse_fields(request, GROUP_FIELDS)
+    return json_response({'results': [
+        serialize(group, GROUP_FIELDS, fields)
+        for group in Group.objects.all()
+    ]})
+
+
+@conditional(group_posts_etag)
+@api_view('GET')
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return paginated(request, group.posts.for_feed(), POST_FIELDS)
+
+
+@conditional(feed_etag)
+@api_view('GET')
+def feed(request):
+    user = require_user(request)
+    return paginated(
+        request, timeline_posts(user), POST_FIELDS, **TIMELINE_ORDER)
+
+
+@conditional(follows_etag)
+@api_view('GET', 'POST')
+@rate_limit('follow', on_limit=limited)
+def follows(request):
+    user = require_user(request)
+    if request.method == 'POST':
+        return follow(request, user)
+    return json_response({'results': [
+        serialize(item, FOLLOW_FIELDS)
+        for item in user.follower.select_related('author').order_by('pk')
+    ]})
+
+
+@retry_if_locked
+def follow(request, user):
+    username = read_data(request).get('author')
+    author = get_object_or_404(User, username=username)
+    if author == user:
+        raise ApiError(400, 'Нельзя подписаться на себя.')
+    item, created = Follow.objects.get_or_create(user=user, author=author)
+    return json_response(serialize(item, FOLLOW_FIELDS),
+                         201 if created else 200)
+
+
+@api_view('DELETE')
+@rate_limit('follow', methods=('DELETE',), on_limit=limited)
+@retry_if_locked
+def unfollow(request, username):
+    user = require_user(request)
+    item = get_object_or_404(
+        Follow, user=user, author__username=username)
+    item.delete()
+    return HttpResponse(status=204)
@@ -0,0 +1,165 @@
+"""ASGI-приложение поверх WSGI-обработчика Django 2.2.
+
+Соединения обслуживает цикл событий сервера (uvicorn, daphne): медленная
+загрузка тела запроса и отправка ответа не занимают поток. Поток из пула
+нужен только на время работы синхронного view. После перехода на
+Django 3.0+ yatube/asgi.py берёт штатный get_asgi_application().
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Сколько кусков ответа ждут отправки, прежде чем поток пула остановится.
+# Обычный ответ Django - один кусок, и поток свободен, не дожидаясь
+# медленного клиента.
+MAX_PENDING_CHUNKS = 16
+
+
+def build_environ(scope, body):
+    """WSGI environ из ASGI scope; строки WSGI - байты в latin-1."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Тип соединения не поддерживается: '
+                             f'{scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_event_loop()
+        messages = asyncio.Queue(maxsize=MAX_PENDING_CHUNKS)
+        state = {'disconnected': False}
+
+        def put(message):
+            # Из потока пула: ждёт, только если клиент не успевает читать.
+            asyncio.run_coroutine_threadsafe(
+                messages.put(message), loop).result()
+
+        wsgi = loop.run_in_executor(
+            self.executor, self.run_wsgi, build_environ(scope, body), put,
+            state)
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    break
+                await send(message)
+        except BaseException:
+            # Клиент ушёл: поток перестаёт читать ответ, очередь
+            # разбирается, чтобы он не завис на put.
+            state['disconnected'] = True
+            while await messages.get() is not None:
+                pass
+            raise
+        finally:
+            try:
+                await wsgi
+            finally:
+                body.close()
+
+    async def read_body(self, receive):
+        """Тело запроса; большое уходит на диск. None - клиент ушёл."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                body.seek(0)
+                return body
+
+    def run_wsgi(self, environ, put, state):
+        """Вызов WSGI-приложения в потоке пула.
+
+        Куски ответа уходят в put по мере того, как их отдаёт итератор:
+        потоковый ответ не собирается в памяти целиком. None в конце
+        отправляется всегда, даже при ошибке.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        def start():
+            # По WSGI start_response можно вызвать и при первом куске.
+            if not response.get('started'):
+                response['started'] = True
+                put({'type': 'http.response.start',
+                     'status': response['status'],
+                     'headers': response['headers']})
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                for chunk in result:
+                    if state['disconnected']:
+                        return
+                    if chunk:
+                        start()
+                        put({'type': 'http.response.body', 'body': chunk,
+                             'more_body': True})
+            finally:
+                # close() шлёт request_finished: соединения с БД закрываются
+                # в том же потоке, где открывались.
+                if hasattr(result, 'close'):
+                    result.close()
+            start()
+            put({'type': 'http.response.body', 'body': b''})
+        finally:
+            put(None)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,445 @@
+import asyncio
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import OperationalError, connection, connections
+from django.template.backends.django import DjangoTemplates
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+from faker import Faker
+
+from core.asgi import WsgiToAsgi, build_environ
+from posts.counters import reconcile_author_stats, reconcile_comment_counts
+from posts.links import post_url
+from posts.models import Comment, Follow, Group, Post
+from posts.timelines import rebuild_timeline
+from posts.writebehind import queue as write_queue
+
+User = get_user_model()
+
+
+@contextmanager
+def file_database():
+    """Тестовая база в файле: её видят все потоки, в отличие от памяти."""
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'benchmark.sqlite3')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            yield
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+
+def seed(users=50, groups=5, posts=2000, comments=5000, follows=500,
+         seed_value=0):
+    """Наполняет базу случайными данными заданного объёма."""
+    fake = Faker('ru_RU')
+    Faker.seed(seed_value)
+    rnd = random.Random(seed_value)
+    User.objects.bulk_create(
+        (User(username=f'bench_{i}', first_name=fake.first_name(),
+              last_name=fake.last_name()) for i in range(users)),
+    )
+    Group.objects.bulk_create(
+        (Group(title=fake.sentence(nb_words=3)[:200], slug=f'bench-{i}',
+               description=fake.text()) for i in range(groups)),
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    group_ids = list(Group.objects.values_list('id', flat=True)) + [None]
+    Post.objects.bulk_create(
+        (Post(text=fake.text(), author_id=rnd.choice(user_ids),
+              group_id=rnd.choice(group_ids)) for _ in range(posts)),
+    )
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    Comment.objects.bulk_create(
+        (Comment(text=fake.sentence(), author_id=rnd.choice(user_ids),
+                 post_id=rnd.choice(post_ids)) for _ in range(comments)),
+    )
+    pairs = {
+        tuple(rnd.sample(user_ids, 2))
+        for _ in range(follows)
+    } if len(user_ids) > 1 else set()
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+    )
+    # bulk_create не шлёт сигналы: достраиваем счётчики и ленты.
+    reconcile_author_stats()
+    reconcile_comment_counts()
+    for user in User.objects.filter(follower__isnull=False).distinct():
+        rebuild_timeline(user)
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def endpoints(reader):
+    """Сценарии: имя, метод, адрес и данные запроса."""
+    post = Post.objects.first()
+    group = Group.objects.first()
+    author = post.author
+    target = User.objects.exclude(pk=reader.pk).exclude(
+        following__user=reader).first() or author
+    yield 'index', 'get', reverse('posts:index'), None
+    yield ('group_list', 'get',
+           reverse('posts:group_list', kwargs={'slug': group.slug}), None)
+    yield ('profile', 'get',
+           reverse('posts:profile', kwargs={'username': author.username}),
+           None)
+    yield ('post_detail', 'get',
+           reverse('posts:post_detail', kwargs={'post_id': post.id}), None)
+    yield 'follow_index', 'get', reverse('posts:follow_index'), None
+    yield ('post_create', 'post', reverse('posts:post_create'),
+           {'text': 'Пост из бенчмарка'})
+    yield ('add_comment', 'post',
+           reverse('posts:add_comment', kwargs={'post_id': post.id}),
+           {'text': 'Комментарий из бенчмарка'})
+    yield ('profile_follow', 'get',
+           reverse('posts:profile_follow',
+                   kwargs={'username': target.username}), None)
+    yield ('profile_unfollow', 'get',
+           reverse('posts:profile_unfollow',
+                   kwargs={'username': target.username}), None)
+
+
+def measure(client, method, address, data, requests, cold=False):
+    timings = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = getattr(client, method)(address, data)
+            timings.append((time.perf_counter() - begin) * 1000)
+        queries.append(len(captured))
+        if response.status_code >= 400:
+            raise RuntimeError(f'{address}: ответ {response.status_code}')
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'rps': round(requests / elapsed, 1),
+        'queries': max(queries),
+    }
+
+
+# Бенчмарк меряет сами view записи, лимиты частоты ему мешают.
+@override_settings(RATE_LIMITS={})
+def run(requests=50, cold=False, only=None):
+    """Прогоняет сценарии от имени читателя, возвращает отчёт по каждому."""
+    reader = (User.objects.filter(follower__isnull=False).first()
+              or User.objects.first())
+    client = Client()
+    client.force_login(reader)
+    report = {}
+    for name, method, address, data in list(endpoints(reader)):
+        if only and name not in only:
+            continue
+        report[name] = measure(client, method, address, data, requests, cold)
+    return report
+
+
+def timed_request(client, address, data=None):
+    """Время запроса в мс и признак успеха, блокировка БД - неуспех."""
+    begin = time.perf_counter()
+    try:
+        if data is None:
+            response = client.get(address)
+        else:
+            response = client.post(address, data)
+        ok = response.status_code < 400
+    except OperationalError:
+        ok = False
+    return ok, (time.perf_counter() - begin) * 1000
+
+
+@override_settings(RATE_LIMITS={})
+def run_concurrent(workers=8, requests=50, write_share=0.2, seed_value=0):
+    """Смешанная нагрузка из нескольких потоков, у каждого своё соединение.
+
+    Каждый поток делает requests запросов: доля write_share - комментарии
+    к посту, остальное - главная страница. Ошибки блокировки считаются
+    отдельно, а не прерывают замер.
+    """
+    post = Post.objects.first()
+    users = list(User.objects.all()[:workers])
+    scenarios = {
+        'read': (reverse('posts:index'), None),
+        'write': (reverse('posts:add_comment', kwargs={'post_id': post.id}),
+                  {'text': 'Комментарий из потока'}),
+    }
+    clients = []
+    for index in range(workers):
+        client = Client()
+        client.force_login(users[index % len(users)])
+        clients.append(client)
+    timings = {'read': [], 'write': []}
+    errors = []
+
+    def worker(index, client):
+        rnd = random.Random(seed_value + index)
+        try:
+            for _ in range(requests):
+                kind = 'write' if rnd.random() < write_share else 'read'
+                ok, elapsed = timed_request(client, *scenarios[kind])
+                # list.append атомарен, отдельная блокировка не нужна.
+                (timings[kind] if ok else errors).append(elapsed)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(index, client))
+               for index, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    completed = len(timings['read']) + len(timings['write'])
+    report = {
+        'workers': workers,
+        'requests': workers * requests,
+        'errors': len(errors),
+        'rps': round(completed / elapsed, 1),
+    }
+    for kind, values in timings.items():
+        for percent in (50, 95):
+            report[f'{kind}_p{percent}_ms'] = (
+                round(percentile(values, percent), 3) if values else None)
+    return report
+
+
+def run_writes(workers=8, requests=50):
+    """Только комментарии к одному посту из нескольких потоков.
+
+    Очередь отложенной записи дописывается в конце, и это время входит в
+    замер: saved_per_s - комментарии, реально сохранённые в базу.
+    """
+    before = Comment.objects.count()
+    started = time.perf_counter()
+    report = run_concurrent(workers, requests, write_share=1.0)
+    write_queue.drain()
+    elapsed = time.perf_counter() - started
+    report['saved'] = Comment.objects.count() - before
+    report['saved_per_s'] = round(report['saved'] / elapsed, 1)
+    return report
+
+
+def http_scope(address):
+    path, _, query = address.partition('?')
+    return {
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': query.encode(), 'http_version': '1.1',
+        'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+
+
+def read_addresses():
+    """Адреса страниц на чтение из сценариев бенчмарка."""
+    reader = User.objects.first()
+    return [address for name, method, address, data in endpoints(reader)
+            if method == 'get' and name in (
+                'index', 'group_list', 'profile', 'post_detail')]
+
+
+def call_wsgi(application, environ):
+    statuses = []
+    result = application(
+        environ, lambda status, headers: statuses.append(int(status[:3])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return statuses[0]
+
+
+def summarize(timings, errors, elapsed):
+    return {
+        'requests': len(timings) + errors,
+        'errors': errors,
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+        'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+    }
+
+
+def serve_wsgi(addresses, connections_count, requests, threads, delay):
+    """Синхронный сервер на threads потоков и медленные клиенты.
+
+    Поток занят соединением целиком, в том числе пока клиент delay секунд
+    передаёт запрос, поэтому остальные клиенты ждут свободный поток.
+    """
+    application = WSGIHandler()
+    slots = threading.BoundedSemaphore(threads)
+    timings = []
+    errors = []
+
+    def client(index):
+        for number in range(requests):
+            address = addresses[(index + number) % len(addresses)]
+            begin = time.perf_counter()
+            with slots:
+                time.sleep(delay)
+                status = call_wsgi(
+                    application, build_environ(http_scope(address), BytesIO()))
+            elapsed = (time.perf_counter() - begin) * 1000
+            (timings if status < 400 else errors).append(elapsed)
+        connections.close_all()
+
+    clients = [threading.Thread(target=client, args=(index,))
+               for index in range(connections_count)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return summarize(timings, len(errors), time.perf_counter() - started)
+
+
+def serve_asgi(addresses, connections_count, requests, threads, delay):
+    """То же через core.asgi: поток нужен только на время работы view."""
+    application = WsgiToAsgi(WSGIHandler(), threads)
+    timings = []
+    errors = []
+
+    async def request(address):
+        statuses = []
+
+        async def receive():
+            await asyncio.sleep(delay)
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await application(http_scope(address), receive, send)
+        return statuses[0]
+
+    async def client(index):
+        for number in range(requests):
+            address = addresses[(index + number) % len(addresses)]
+            begin = time.perf_counter()
+            status = await request(address)
+            elapsed = (time.perf_counter() - begin) * 1000
+            (timings if status < 400 else errors).append(elapsed)
+
+    async def main():
+        await asyncio.gather(*(client(index)
+                               for index in range(connections_count)))
+
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        elapsed = time.perf_counter() - started
+        application.executor.submit(connections.close_all).result()
+        application.executor.shutdown()
+        loop.close()
+    return summarize(timings, len(errors), elapsed)
+
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+TEMPLATE_MODES = {
+    'plain': LOADERS,
+    'cached': [('django.template.loaders.cached.Loader', LOADERS)],
+    'inlined': [('core.template_loaders.Loader', LOADERS)],
+}
+
+
+def template_backend(loaders):
+    """Движок шаблонов проекта с заданными загрузчиками."""
+    config = settings.TEMPLATES[0]
+    options = dict(config['OPTIONS'], loaders=loaders, debug=False)
+    return DjangoTemplates({
+        'NAME': 'benchmark', 'DIRS': config['DIRS'], 'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+def template_contexts(client, addresses):
+    """Шаблон каждой страницы и контекст, с которым он отрисован."""
+    contexts = {}
+    for address in addresses:
+        response = client.get(address)
+        context = response.context
+        if isinstance(context, list):
+            context = context[0]
+        flat = context.flatten()
+        # Фрагментный кэш спрятал бы саму отрисовку.
+        if 'cache_timeout' in flat:
+            flat['cache_timeout'] = 0
+        contexts[response.templates[0].name] = (flat, response.wsgi_request)
+    post = Post.objects.for_feed().first()
+    contexts['posts/includes/post_card.html'] = ({'post': post}, None)
+    return contexts
+
+
+def render_templates(contexts, iterations=100):
+    """Среднее время загрузки и отрисовки шаблона в мкс по режимам."""
+    report = {}
+    for mode, loaders in TEMPLATE_MODES.items():
+        backend = template_backend(loaders)
+        for name, (context, request) in contexts.items():
+            backend.get_template(name).render(context, request)
+            begin = time.perf_counter()
+            for _ in range(iterations):
+                backend.get_template(name).render(context, request)
+            elapsed = time.perf_counter() - begin
+            report.setdefault(name, {})[mode] = round(
+                elapsed / iterations * 1e6, 1)
+    return report
+
+
+def reverse_urls(iterations=10000):
+    """Среднее время построения адресов ленты в мкс: reverse и post_url."""
+    post = Post.objects.select_related('author', 'group').exclude(
+        group=None).first()
+    links = {
+        'post_detail': (post.pk,),
+        'group_list': (post.group.slug,),
+        'profile': (post.author.username,),
+    }
+    report = {}
+    for name, args in links.items():
+        row = report[name] = {}
+        for mode, build in (
+                ('reverse', lambda: reverse(f'posts:{name}', args=args)),
+                ('post_url', lambda: post_url(name, *args))):
+            begin = time.perf_counter()
+            for _ in range(iterations):
+                build()
+            row[mode] = round(
+                (time.perf_counter() - begin) / iterations * 1e6, 3)
+    return report
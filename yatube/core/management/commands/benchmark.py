@@ -0,0 +1,83 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.utils import timezone
+
+from core import benchmark
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную базу данными и замеряет задержки, '
+            'пропускную способность и число запросов к БД по адресам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число запросов к каждому адресу.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--only', nargs='+', help='Замерить только эти сценарии.')
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+        parser.add_argument(
+            '--baseline', help='JSON-отчёт прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in
+                   ('users', 'groups', 'posts', 'comments', 'follows')}
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            benchmark.seed(**dataset)
+            endpoints = benchmark.run(
+                options['requests'], options['cold'], options['only'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'dataset': dataset,
+            'cold_cache': options['cold'],
+            'endpoints': endpoints,
+        }
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['endpoints']
+        self.print_table(endpoints, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_table(self, endpoints, baseline):
+        self.stdout.write(
+            f'{"адрес":<18}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"rps":>9}{"SQL":>6}')
+        for name, row in endpoints.items():
+            line = (f'{name:<18}{row["p50_ms"]:>9}{row["p95_ms"]:>9}'
+                    f'{row["p99_ms"]:>9}{row["rps"]:>9}{row["queries"]:>6}')
+            if name in baseline:
+                before = baseline[name]['p95_ms']
+                change = (row['p95_ms'] - before) / before * 100
+                line += f'  p95 {change:+.0f}%'
+            self.stdout.write(line)
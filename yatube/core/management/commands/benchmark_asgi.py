@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает WSGI и ASGI (yatube/asgi.py) на страницах чтения '
+            'при множестве одновременных медленных соединений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--connections', type=int, default=64,
+            help='Число одновременных соединений-клиентов.')
+        parser.add_argument(
+            '--requests', type=int, default=10,
+            help='Число запросов от каждого соединения.')
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Потоки WSGI-сервера и пула ASGI-адаптера.')
+        parser.add_argument(
+            '--client-delay', type=float, default=100,
+            help='Сколько мс клиент передаёт запрос.')
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан на SQLite.')
+        arguments = (options['connections'], options['requests'],
+                     options['threads'], options['client_delay'] / 1000)
+        report = {}
+        with benchmark.file_database():
+            benchmark.seed(users=20, groups=2, posts=options['posts'],
+                           comments=options['posts'], follows=50)
+            addresses = benchmark.read_addresses()
+            # Журнал медленных запросов здесь только мешает.
+            with override_settings(SLOW_REQUEST_MS=float('inf'),
+                                   SLOW_REQUEST_QUERIES=float('inf')):
+                report['wsgi'] = benchmark.serve_wsgi(addresses, *arguments)
+                report['asgi'] = benchmark.serve_asgi(addresses, *arguments)
+        self.print_table(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_table(self, report):
+        self.stdout.write(
+            f'{"режим":<8}{"rps":>9}{"p50":>10}{"p95":>10}{"ошибок":>8}')
+        for mode, row in report.items():
+            self.stdout.write(
+                f'{mode:<8}{row["rps"]:>9}{str(row["p50_ms"]):>10}'
+                f'{str(row["p95_ms"]):>10}{row["errors"]:>8}')
+        gain = report['asgi']['rps'] / report['wsgi']['rps']
+        self.stdout.write(f'Прирост пропускной способности: x{gain:.2f}')
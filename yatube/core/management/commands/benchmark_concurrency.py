@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from core import benchmark
+
+# Настройки SQLite, с которыми Django работает без core.sqlite.
+STOCK_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'busy_timeout': 5000,
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite со стандартными '
+            'и настроенными PRAGMA при одновременных чтении и записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Число одновременных потоков-клиентов.')
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число запросов от каждого потока.')
+        parser.add_argument(
+            '--write-share', type=float, default=0.2,
+            help='Доля запросов на запись.')
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('Сравнение имеет смысл только для SQLite.')
+        modes = {
+            'stock': {'SQLITE_PRAGMAS': STOCK_PRAGMAS,
+                      'SQLITE_LOCK_RETRIES': 0},
+            'tuned': {'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+                      'SQLITE_LOCK_RETRIES': settings.SQLITE_LOCK_RETRIES},
+        }
+        report = {}
+        # Потокам нужна общая база в файле, а не в памяти.
+        with benchmark.file_database():
+            benchmark.seed(users=options['workers'], groups=2,
+                           posts=options['posts'],
+                           comments=options['posts'], follows=0)
+            for mode, overrides in modes.items():
+                # Журнал медленных запросов здесь только мешает.
+                with override_settings(SLOW_REQUEST_MS=float('inf'),
+                                       SLOW_REQUEST_QUERIES=float('inf'),
+                                       **overrides):
+                    connections.close_all()
+                    report[mode] = benchmark.run_concurrent(
+                        options['workers'], options['requests'],
+                        options['write_share'])
+        self.print_table(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_table(self, report):
+        self.stdout.write(
+            f'{"режим":<8}{"rps":>9}{"чтение p95":>12}'
+            f'{"запись p95":>12}{"ошибок":>8}')
+        for mode, row in report.items():
+            self.stdout.write(
+                f'{mode:<8}{row["rps"]:>9}{str(row["read_p95_ms"]):>12}'
+                f'{str(row["write_p95_ms"]):>12}{row["errors"]:>8}')
+        gain = report['tuned']['rps'] / report['stock']['rps']
+        self.stdout.write(f'Прирост пропускной способности: x{gain:.2f}')
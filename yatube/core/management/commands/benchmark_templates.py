@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время отрисовки шаблонов страниц без кэша, '
+            'с кэширующим загрузчиком и со встроенными include.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Сколько раз отрисовать каждый шаблон.')
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        with benchmark.file_database():
+            benchmark.seed(users=10, groups=2, posts=options['posts'],
+                           comments=options['posts'], follows=30)
+            reader = benchmark.User.objects.filter(
+                follower__isnull=False).first()
+            client = benchmark.Client()
+            client.force_login(reader)
+            addresses = [
+                address for name, method, address, data
+                in benchmark.endpoints(reader) if method == 'get'
+                and name not in ('profile_follow', 'profile_unfollow')
+            ]
+            contexts = benchmark.template_contexts(client, addresses)
+            report = benchmark.render_templates(
+                contexts, options['iterations'])
+        self.print_table(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_table(self, report):
+        modes = list(benchmark.TEMPLATE_MODES)
+        self.stdout.write(f'{"шаблон, мкс":<34}' + ''.join(
+            f'{mode:>10}' for mode in modes))
+        for name, row in report.items():
+            self.stdout.write(f'{name:<34}' + ''.join(
+                f'{row[mode]:>10}' for mode in modes))
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает построение адресов ленты через reverse '
+            'и через запомненный posts.links.post_url.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=10000,
+            help='Сколько раз построить каждый адрес.')
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        with benchmark.file_database():
+            benchmark.seed(users=2, groups=1, posts=10, comments=0,
+                           follows=0)
+            report = benchmark.reverse_urls(options['iterations'])
+        self.stdout.write(f'{"адрес, мкс":<14}{"reverse":>10}{"post_url":>10}')
+        for name, row in report.items():
+            self.stdout.write(
+                f'{name:<14}{row["reverse"]:>10}{row["post_url"]:>10}')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
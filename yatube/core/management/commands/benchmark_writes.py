@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает устойчивую пропускную способность записи '
+            'комментариев напрямую и через очередь posts.writebehind.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=16,
+            help='Число одновременных потоков-клиентов.')
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число комментариев от каждого потока.')
+        parser.add_argument(
+            '--interval', type=float, default=0.5,
+            help='Интервал сброса очереди в секундах.')
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Сравнение имеет смысл только для SQLite.')
+        modes = {
+            'direct': {'WRITE_BEHIND': False},
+            'batched': {'WRITE_BEHIND': True,
+                        'WRITE_BEHIND_INTERVAL': options['interval']},
+        }
+        report = {}
+        with benchmark.file_database():
+            benchmark.seed(users=options['workers'], groups=1, posts=100,
+                           comments=100, follows=0)
+            for mode, overrides in modes.items():
+                with override_settings(SLOW_REQUEST_MS=float('inf'),
+                                       SLOW_REQUEST_QUERIES=float('inf'),
+                                       **overrides):
+                    connections.close_all()
+                    report[mode] = benchmark.run_writes(
+                        options['workers'], options['requests'])
+        self.stdout.write(
+            f'{"режим":<9}{"rps":>9}{"запись p95":>12}'
+            f'{"сохранено/с":>13}{"ошибок":>8}')
+        for mode, row in report.items():
+            self.stdout.write(
+                f'{mode:<9}{row["rps"]:>9}{str(row["write_p95_ms"]):>12}'
+                f'{row["saved_per_s"]:>13}{row["errors"]:>8}')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Повторять копирование каждые N секунд.')
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError(
+                'Реплики не настроены, задайте YATUBE_DB_REPLICAS.')
+        while True:
+            begin = time.perf_counter()
+            for alias in replicas:
+                try:
+                    sync_replica(connections[alias].settings_dict['NAME'])
+                except ValueError as error:
+                    raise CommandError(error)
+            elapsed = (time.perf_counter() - begin) * 1000
+            self.stdout.write(
+                f'Реплики обновлены: {", ".join(replicas)} '
+                f'({elapsed:.0f} ms)'
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.backends.django import DjangoTemplates, Template
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL, шаблоны и кэш."""
+
+    def __init__(self):
+        self.queries = []
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_query(self, sql, duration):
+        self.queries.append((sql, duration))
+        self.db_time += duration
+
+    def slowest_queries(self, limit):
+        return sorted(self.queries, key=lambda query: -query[1])[:limit]
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper, замеряет каждый запрос."""
+    begin = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.add_query(sql, time.perf_counter() - begin)
+
+
+class MetricsTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current()
+        # Вложенная отрисовка (карточки внутри ленты) уже входит во время
+        # внешней: замеряем только самый внешний шаблон.
+        depth = getattr(_local, 'template_depth', 0)
+        if metrics is None or depth:
+            return super().render(context, request)
+        _local.template_depth = 1
+        begin = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - begin
+            _local.template_depth = 0
+
+
+class MetricsDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время отрисовки."""
+
+    def from_string(self, template_code):
+        return MetricsTemplate(
+            self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return MetricsTemplate(template.template, self)
+
+
+class MetricsLocMemCache(LocMemCache):
+    """LocMemCache, считающий попадания и промахи текущего запроса."""
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        self._count(value is not self._missing)
+        return default if value is self._missing else value
+
+    def get_many(self, keys, version=None):
+        found = super().get_many(keys, version)
+        metrics = current()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    def _count(self, hit):
+        metrics = current()
+        if metrics is None:
+            return
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
@@ -0,0 +1,107 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .routers import replica_reads
+
+logger = logging.getLogger('yatube.slow_requests')
+
+
+class RequestMetricsMiddleware:
+    """Замеряет SQL, шаблоны и кэш, отдаёт их в заголовке Server-Timing.
+
+    Запросы дольше SLOW_REQUEST_MS или с числом SQL больше
+    SLOW_REQUEST_QUERIES пишутся в лог yatube.slow_requests вместе
+    с самыми медленными запросами к базе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collected = metrics.start()
+        begin = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total = time.perf_counter() - begin
+        response['Server-Timing'] = self.server_timing(collected, total)
+        if (total * 1000 > settings.SLOW_REQUEST_MS
+                or len(collected.queries) > settings.SLOW_REQUEST_QUERIES):
+            self.log_slow_request(request, response, collected, total)
+        return response
+
+    @staticmethod
+    def server_timing(collected, total):
+        return ', '.join((
+            f'db;dur={collected.db_time * 1000:.1f};'
+            f'desc="{len(collected.queries)} queries"',
+            f'tpl;dur={collected.template_time * 1000:.1f}',
+            f'cache;desc="hits={collected.cache_hits} '
+            f'misses={collected.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    @staticmethod
+    def log_slow_request(request, response, collected, total):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(collected.db_time * 1000, 1),
+            'template_ms': round(collected.template_time * 1000, 1),
+            'queries': len(collected.queries),
+            'cache_hits': collected.cache_hits,
+            'cache_misses': collected.cache_misses,
+            'slowest_sql': [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for sql, duration in collected.slowest_queries(
+                    settings.SLOW_REQUEST_SQL_LIMIT)
+            ],
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+class ReplicaPinMiddleware:
+    """Отправляет чтение безопасных запросов на реплику.
+
+    Изменяющие запросы и запросы, во время которых была запись, ставят
+    cookie REPLICA_PIN_COOKIE со временем записи: пока она жива, запросы
+    клиента читают только с реплик, скопированных позже, и видят свои
+    изменения. Остальные клиенты читают с реплик, отстающих не больше чем
+    на REPLICA_MAX_LAG секунд.
+    """
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in self.safe_methods
+        pin = request.COOKIES.get(settings.REPLICA_PIN_COOKIE)
+        since = int(pin) if pin and pin.isdigit() else None
+        # Cookie без времени записи - чтение из основной базы.
+        allowed = safe and (pin is None or since is not None)
+        with replica_reads(allowed, since) as state:
+            response = self.get_response(request)
+        if state.wrote or not safe:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, str(time.time_ns()),
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
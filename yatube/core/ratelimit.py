@@ -0,0 +1,91 @@
+"""Ограничение частоты записи: token bucket в кэше Django.
+
+У каждого действия (пост, комментарий, подписка) свои вёдра на
+пользователя и на IP, лимиты задаёт RATE_LIMITS. Ведро хранит остаток
+жетонов и время последнего запроса: жетоны копятся с постоянной скоростью
+до размера ведра, запрос тратит один. Проверка - одно чтение и одна запись
+в кэш. Чтение и запись не атомарны, при гонке проскочит лишний запрос,
+зато нет блокировок; лимит защищает от потока записей, а не от единичных.
+"""
+import functools
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .views import too_many_requests
+
+KEY = 'ratelimit:{}:{}:{}'
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/m' или '100/5m' - размер ведра и время наполнения в секундах."""
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f'Неверный лимит: {rate}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def client_ip(request):
+    # X-Forwarded-For подделывает кто угодно; за прокси REMOTE_ADDR
+    # должен выставлять сам прокси.
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def identities(request):
+    """Кого ограничиваем: пользователя, если он вошёл, и IP."""
+    if request.user.is_authenticated:
+        yield 'user', request.user.pk
+    yield 'ip', client_ip(request)
+
+
+def take(key, rate, now=None):
+    """Берёт жетон из ведра; 0 - можно, иначе сколько секунд ждать."""
+    capacity, period = parse_rate(rate)
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    now = time.time() if now is None else now
+    tokens, stamp = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    if tokens < 1:
+        return (1 - tokens) * period / capacity
+    # За period пустое ведро наполняется: истёкший ключ и есть полное ведро.
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+def check(request, action, now=None):
+    """Секунды до следующей разрешённой записи, 0 - лимит не достигнут."""
+    limits = settings.RATE_LIMITS.get(action, {})
+    wait = 0
+    for kind, identity in identities(request):
+        if kind in limits:
+            wait = max(wait, take(
+                KEY.format(action, kind, identity), limits[kind], now))
+    return wait
+
+
+def rate_limit(action, methods=('POST',), on_limit=None):
+    """Отвечает on_limit(request) со статусом 429, если лимит исчерпан.
+
+    Считаются только запросы с методами из methods: показ формы по GET
+    жетон не тратит. Без on_limit отдаётся страница core/429.html.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check(request, action)
+                if wait:
+                    response = (on_limit or too_many_requests)(request)
+                    response.status_code = 429
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,155 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads(allowed=True, since=None):
+    """Разрешает чтение с реплик на время обработки запроса.
+
+    since - время последней записи клиента в наносекундах: реплики,
+    скопированные раньше, её не видят. Вне этого блока (команды, фоновые
+    задачи) всё идёт в основную базу. После первой записи внутри блока
+    чтение тоже возвращается в неё.
+    """
+    replicas = fresh_replicas(since) if allowed else {}
+    _state.replica = random.choice(list(replicas)) if replicas else None
+    _state.synced = replicas.get(_state.replica)
+    _state.wrote = False
+    try:
+        yield _state
+    finally:
+        _state.replica = _state.synced = None
+
+
+def require_synced(changed):
+    """Дальше в запросе читать из основной базы, если реплика скопирована
+    до изменения changed (в наносекундах).
+
+    Версии кэша - время их сдвига: страница, закэшированная под новой
+    версией, не должна собираться со старой копии. Время копирования
+    неизвестно (реплики другой СУБД) - реплика считается свежей.
+    """
+    synced = getattr(_state, 'synced', None)
+    if synced is not None and synced < changed:
+        _state.replica = None
+
+
+def replica_behind():
+    """Читает ли запрос с реплики, скопированной до последней записи."""
+    synced = getattr(_state, 'synced', None)
+    if getattr(_state, 'replica', None) is None or synced is None:
+        return False
+    written = _written_at(connections[PRIMARY].settings_dict['NAME'])
+    return written is not None and synced < written
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, ValueError):
+        return None
+
+
+def _written_at(name):
+    """Время последней записи в файл SQLite, в WAL пишется в файл -wal."""
+    times = [mtime for mtime in (_mtime(name), _mtime(f'{name}-wal'))
+             if mtime is not None]
+    return max(times, default=None)
+
+
+def synced_path(name):
+    return f'{name}.synced'
+
+
+def synced_at(replica):
+    return _mtime(synced_path(replica))
+
+
+def is_fresh(primary, replica, since=None, now=None):
+    """Можно ли читать с реплики: она скопирована после последней записи
+    в основную базу или не раньше, чем REPLICA_MAX_LAG секунд назад.
+
+    С since реплика должна быть скопирована и после записи клиента. Без
+    файла основной базы (база в памяти, другая СУБД) отставание не узнать,
+    реплика считается свежей.
+    """
+    synced = synced_at(replica) or 0
+    if since is not None and synced < since:
+        return False
+    written = _written_at(primary)
+    if written is None or synced >= written:
+        return True
+    now = time.time_ns() if now is None else now
+    return now - synced <= settings.REPLICA_MAX_LAG * 10 ** 9
+
+
+def fresh_replicas(since=None):
+    """Реплики, с которых можно читать, с временем их копирования.
+
+    Реплика, которая смотрит в файл основной базы (в тестах это зеркало
+    default), ничего не разгружает, а через второе соединение не видит
+    незакоммиченных строк, поэтому не используется.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return {}
+    primary = connections[PRIMARY].settings_dict['NAME']
+    names = {alias: connections[alias].settings_dict['NAME']
+             for alias in replicas}
+    return {alias: synced_at(name) for alias, name in names.items()
+            if name != primary and is_fresh(primary, name, since)}
+
+
+class ReplicaRouter:
+    """Чтение - с реплики, выбранной на запрос, запись - в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'wrote', False):
+            return PRIMARY
+        return getattr(_state, 'replica', None) or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def sync_replica(path):
+    """Копирует основную базу SQLite в файл реплики path через backup API.
+
+    Копия согласованная: читатели реплики видят либо старый, либо новый
+    снимок, а запись в основную базу не блокируется на всё время копии.
+    """
+    source = connections[PRIMARY]
+    if source.vendor != 'sqlite':
+        raise ValueError(
+            'Копировать можно только SQLite, другие СУБД синхронизируют '
+            'реплики своей репликацией.')
+    source.ensure_connection()
+    started = time.time_ns()
+    destination = sqlite3.connect(path)
+    try:
+        source.connection.backup(destination)
+    finally:
+        destination.close()
+    # Время начала копии: записи во время копирования в неё не попали.
+    # Файл отдельный, ведь сам файл реплики меняет и её checkpoint.
+    with open(synced_path(path), 'w'):
+        pass
+    os.utime(synced_path(path), ns=(started, started))
@@ -0,0 +1,45 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Выставляет SQLITE_PRAGMAS каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(error):
+    return any(message in str(error) for message in LOCK_MESSAGES)
+
+
+def retry_if_locked(view):
+    """Повторяет view, если SQLite не дал взять блокировку на запись.
+
+    View выполняется в транзакции, поэтому неудачная попытка целиком
+    откатывается. Паузы между попытками растут вдвое от
+    SQLITE_LOCK_BACKOFF, со случайным разбросом, чтобы конкурирующие
+    процессы не просыпались одновременно.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                with transaction.atomic():
+                    return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if (not is_lock_error(error)
+                        or attempt >= settings.SQLITE_LOCK_RETRIES):
+                    raise
+            delay = settings.SQLITE_LOCK_BACKOFF * 2 ** attempt
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            attempt += 1
+    return wrapper
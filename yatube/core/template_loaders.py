@@ -0,0 +1,83 @@
+"""Кэширующий загрузчик шаблонов, встраивающий постоянные include.
+
+`{% include 'имя' %}` без аргументов заменяется исходником шаблона при
+компиляции, поэтому отрисовка не ищет и не вызывает вложенный шаблон.
+Встраиваются только шаблоны без extends, block и тегов `... as имя`: им не
+нужна отдельная область контекста, которую даёт include.
+"""
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.template import Engine, TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loaders import cached
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_RE = re.compile(r'''{%\s*include\s+(['"])([^'"]+)\1\s*%}''')
+# {% with ... as ... %} заводит свою область и встраиванию не мешает.
+NOT_INLINED_RE = re.compile(
+    r'{%\s*(extends|block)\s|{%(?!\s*with\s)[^%]*\sas\s+\w+\s*%}')
+MAX_DEPTH = 5
+
+
+class Loader(cached.Loader):
+    def get_contents(self, origin):
+        return self.inline(super().get_contents(origin))
+
+    def inline(self, source, depth=0):
+        if depth >= MAX_DEPTH:
+            return source
+
+        def replace(match):
+            included = self.source_of(match.group(2))
+            if included is None or NOT_INLINED_RE.search(included):
+                return match.group(0)
+            return self.inline(included, depth + 1)
+
+        return INCLUDE_RE.sub(replace, source)
+
+    def source_of(self, name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(name):
+                try:
+                    return loader.get_contents(origin)
+                except TemplateDoesNotExist:
+                    pass
+        return None
+
+
+def template_names(engine):
+    """Имена всех шаблонов в каталогах загрузчиков движка."""
+    directories = []
+    for loader in engine.template_loaders:
+        # Кэширующий загрузчик в Django 2.2 не отдаёт каталоги сам.
+        for inner in getattr(loader, 'loaders', [loader]):
+            directories.extend(inner.get_dirs())
+    names = set()
+    for directory in map(str, directories):
+        for root, _, files in os.walk(directory):
+            for file in files:
+                path = os.path.relpath(os.path.join(root, file), directory)
+                names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up(engine=None):
+    """Компилирует все шаблоны в кэш загрузчика до первого запроса.
+
+    Возвращает число скомпилированных шаблонов, без кэша - 0.
+    """
+    if not settings.TEMPLATE_CACHE:
+        return 0
+    engine = engine or Engine.get_default()
+    compiled = 0
+    for name in template_names(engine):
+        try:
+            engine.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            logger.warning('Шаблон %s не скомпилирован: %s', name, error)
+        else:
+            compiled += 1
+    return compiled
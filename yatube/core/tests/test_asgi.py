@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase
+
+from core.asgi import WsgiToAsgi, build_environ
+from core.benchmark import http_scope
+
+
+def echo(environ, start_response):
+    """WSGI-приложение, возвращающее метод, путь, заголовок и тело."""
+    start_response('201 Created', [('Content-Type', 'text/plain')])
+    body = environ['wsgi.input'].read()
+    return [environ['REQUEST_METHOD'].encode(), b' ',
+            environ['PATH_INFO'].encode('latin1'), b' ',
+            environ.get('HTTP_X_TEST', '').encode(), b' ', body]
+
+
+class Stream:
+    """Потоковый ответ: второй кусок ждёт, пока клиент получит первый."""
+
+    def __init__(self):
+        self.first_sent = threading.Event()
+        self.waited = None
+        self.closed = False
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return self
+
+    def __iter__(self):
+        yield b'first '
+        self.waited = self.first_sent.wait(5)
+        yield b'second'
+
+    def close(self):
+        self.closed = True
+
+
+class WsgiToAsgiTest(SimpleTestCase):
+    def call(self, application, scope, messages, on_first=None):
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+            if message.get('body') == b'first ' and on_first:
+                on_first()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(application(scope, receive, send))
+        finally:
+            loop.close()
+        return sent
+
+    def test_environ_from_scope(self):
+        scope = http_scope('/posts/1/?page=2')
+        scope['headers'] += [(b'content-type', b'text/plain'),
+                             (b'x-test', b'a'), (b'x-test', b'b')]
+        environ = build_environ(scope, None)
+        self.assertEqual(environ['PATH_INFO'], '/posts/1/')
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_TEST'], 'a,b')
+        self.assertEqual(environ['HTTP_HOST'], 'localhost')
+
+    def test_body_in_chunks(self):
+        scope = dict(http_scope('/путь/'), method='POST',
+                     headers=[(b'x-test', b'header')])
+        sent = self.call(WsgiToAsgi(echo, threads=1), scope, [
+            {'type': 'http.request', 'body': b'part1 ', 'more_body': True},
+            {'type': 'http.request', 'body': b'part2'},
+        ])
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body.decode(), 'POST /путь/ header part1 part2')
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_disconnect_skips_view(self):
+        sent = self.call(WsgiToAsgi(echo, threads=1), http_scope('/'),
+                         [{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        sent = self.call(WsgiToAsgi(echo, threads=1), {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message['type'] for message in sent],
+                         ['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'])
+
+    def test_django_pages(self):
+        application = WsgiToAsgi(WSGIHandler(), threads=2)
+        messages = [{'type': 'http.request', 'body': b''}]
+        sent = self.call(application, http_scope('/about/author/'),
+                         list(messages))
+        self.assertEqual(sent[0]['status'], 200)
+        sent = self.call(application, http_scope('/no-such-page/'),
+                         list(messages))
+        self.assertEqual(sent[0]['status'], 404)
+
+    def test_chunks_sent_as_produced(self):
+        stream = Stream()
+        sent = self.call(
+            WsgiToAsgi(stream, threads=1), http_scope('/'),
+            [{'type': 'http.request', 'body': b''}],
+            on_first=stream.first_sent.set)
+        self.assertTrue(stream.waited)
+        self.assertEqual([message.get('body') for message in sent[1:]],
+                         [b'first ', b'second', b''])
+        self.assertTrue(stream.closed)
+
+    def test_client_gone_stops_stream(self):
+        stream = Stream()
+
+        def disconnect():
+            stream.first_sent.set()
+            raise OSError('Клиент закрыл соединение')
+
+        with self.assertRaises(OSError):
+            self.call(WsgiToAsgi(stream, threads=1), http_scope('/'),
+                      [{'type': 'http.request', 'body': b''}],
+                      on_first=disconnect)
+        self.assertTrue(stream.closed)
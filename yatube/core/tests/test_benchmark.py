@@ -0,0 +1,40 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import benchmark
+from posts.models import AuthorStats, Post, TimelineEntry
+
+
+class BenchmarkTest(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 95), 95)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+
+    def test_seed_and_run(self):
+        benchmark.seed(users=5, groups=2, posts=30, comments=10, follows=5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(AuthorStats.objects.count(), 5)
+        self.assertTrue(TimelineEntry.objects.exists())
+        report = benchmark.run(requests=2)
+        self.assertEqual(
+            set(report),
+            {'index', 'group_list', 'profile', 'post_detail', 'follow_index',
+             'post_create', 'add_comment', 'profile_follow',
+             'profile_unfollow'})
+        for row in report.values():
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+            self.assertGreater(row['queries'], 0)
+
+    def test_render_templates(self):
+        benchmark.seed(users=2, groups=1, posts=3, comments=3, follows=1)
+        contexts = benchmark.template_contexts(
+            Client(), [reverse('posts:index')])
+        report = benchmark.render_templates(contexts, iterations=1)
+        self.assertEqual(
+            set(report),
+            {'posts/index.html', 'posts/includes/post_card.html'})
+        for row in report.values():
+            self.assertEqual(set(row), set(benchmark.TEMPLATE_MODES))
@@ -0,0 +1,71 @@
+import itertools
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.address = reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+
+    def test_server_timing_header(self):
+        response = self.client.get(self.address)
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'queries"', 'tpl;dur=', 'cache;desc=',
+                       'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertNotIn('tpl;dur=0.0,', timing)
+
+    def test_nested_render_counted_once(self):
+        engine = engines['metrics']
+        inner = engine.from_string('карточка')
+        outer = engine.from_string('{{ card }}')
+        clock = itertools.count()
+        metrics.start()
+        self.addCleanup(metrics.stop)
+        with mock.patch('core.metrics.time.perf_counter',
+                        lambda: next(clock)):
+            html = outer.render({'card': inner.render})
+        self.assertEqual(html, 'карточка')
+        # Внешний шаблон: 0 и 1, вложенный часы уже не спрашивает.
+        self.assertEqual(metrics.current().template_time, 1)
+
+    def test_cache_hits_counted(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('hits=0 ', response['Server-Timing'])
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_logged_with_sql(self):
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.client.get(self.address)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:profile')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('SELECT', record['slowest_sql'][0]['sql'])
+
+    def test_fast_request_not_logged(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.slow_requests', 'WARNING'):
+                self.client.get(reverse('about:author'))
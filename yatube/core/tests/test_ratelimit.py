@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import ratelimit
+from posts import writebehind
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+LIMITS = {
+    'comment': {'user': '2/m', 'ip': '3/m'},
+    'follow': {'user': '2/m'},
+}
+
+
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('100/5m'), (100, 300))
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate('10 в минуту')
+
+    def test_bucket_refills_over_time(self):
+        for _ in range(2):
+            self.assertEqual(ratelimit.take('bucket', '2/m', now=0), 0)
+        self.assertEqual(ratelimit.take('bucket', '2/m', now=0), 30)
+        # За 15 секунд набралась половина жетона: ждать ещё 15.
+        self.assertEqual(ratelimit.take('bucket', '2/m', now=15), 15)
+        self.assertEqual(ratelimit.take('bucket', '2/m', now=30), 0)
+        # Ведро не наполняется сверх размера.
+        for _ in range(2):
+            self.assertEqual(ratelimit.take('bucket', '2/m', now=1000), 0)
+        self.assertGreater(ratelimit.take('bucket', '2/m', now=1000), 0)
+
+    def test_buckets_kept_apart_from_pages(self):
+        ratelimit.take('bucket', '2/m', now=0)
+        cache.clear()
+        self.assertEqual(caches['ratelimit'].get('bucket')[0], 1)
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+        self.author = User.objects.create_user(username='author')
+        self.user = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.id})
+
+    def test_comment_limited_per_user(self):
+        for _ in range(2):
+            response = self.client.post(self.comment_url, {'text': 'Да'})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(self.comment_url, {'text': 'Да'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertTemplateUsed(response, 'core/429.html')
+        # С YATUBE_WRITE_BEHIND=1 комментарии сначала ждут в очереди.
+        writebehind.queue.drain()
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_comment_limited_per_ip(self):
+        self.client.post(self.comment_url, {'text': 'Да'})
+        other = Client()
+        other.force_login(self.author)
+        for _ in range(2):
+            other.post(self.comment_url, {'text': 'Да'})
+        # Ведро автора не пусто, но IP уже потратил три жетона.
+        response = other.post(self.comment_url, {'text': 'Да'})
+        self.assertEqual(response.status_code, 429)
+        writebehind.queue.drain()
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_follow_and_unfollow_share_bucket(self):
+        follow = reverse('posts:profile_follow', args=[self.author.username])
+        unfollow = reverse(
+            'posts:profile_unfollow', args=[self.author.username])
+        self.client.get(follow)
+        self.client.get(unfollow)
+        self.assertEqual(self.client.get(follow).status_code, 429)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_form_page_not_limited(self):
+        for _ in range(5):
+            response = self.client.get(reverse('posts:post_create'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_api_answers_json(self):
+        address = reverse('api:comments', kwargs={'post_id': self.post.id})
+        for _ in range(2):
+            self.client.post(address, {'text': 'Да'})
+        response = self.client.post(address, {'text': 'Да'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(),
+                         {'detail': 'Слишком много запросов.'})
+        self.assertIn('Retry-After', response)
+        # Чтение лимит не тратит.
+        self.assertEqual(self.client.get(address).status_code, 200)
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+
+from core.middleware import ReplicaPinMiddleware
+from core.routers import is_fresh, sync_replica, synced_path
+from posts.caches import bump_versions, get_versions
+from posts.models import Post
+
+User = get_user_model()
+
+
+def replica_synced_at(synced):
+    """fresh_replicas с одной репликой, скопированной в момент synced."""
+    def fresh_replicas(since=None):
+        return {} if since and since > synced else {'replica_1': synced}
+    return mock.patch('core.routers.fresh_replicas', fresh_replicas)
+
+
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.read_from = []
+        patcher = replica_synced_at(100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def view(self, write=False, scope=None):
+        def get_response(request):
+            self.read_from.append(Post.objects.all().db)
+            if write:
+                router.db_for_write(Post)
+                self.read_from.append(Post.objects.all().db)
+            if scope:
+                get_versions(scope)
+                self.read_from.append(Post.objects.all().db)
+            return HttpResponse()
+        return ReplicaPinMiddleware(get_response)
+
+    def test_safe_request_reads_from_replica(self):
+        response = self.view()(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['replica_1'])
+        self.assertNotIn('pin_primary', response.cookies)
+        self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_post_request_pins_primary(self):
+        response = self.view()(self.factory.post('/'))
+        self.assertEqual(self.read_from, ['default'])
+        self.assertIn('pin_primary', response.cookies)
+
+    def test_write_during_get_switches_to_primary(self):
+        response = self.view(write=True)(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['replica_1', 'default'])
+        self.assertIn('pin_primary', response.cookies)
+
+    def test_pinned_client_reads_replica_synced_after_write(self):
+        for written, db in (('200', 'default'), ('50', 'replica_1'),
+                            ('yes', 'default')):
+            with self.subTest(written=written):
+                self.read_from = []
+                request = self.factory.get('/')
+                request.COOKIES['pin_primary'] = written
+                self.view()(request)
+                self.assertEqual(self.read_from, [db])
+
+    def test_version_newer_than_replica_switches_to_primary(self):
+        bump_versions('feed')
+        self.view(scope='feed')(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['replica_1', 'default'])
+
+
+class SyncReplicaTest(TransactionTestCase):
+    def test_copies_primary(self):
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Тестовый пост')
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        sync_replica(path)
+        self.addCleanup(os.remove, synced_path(path))
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        (count,), = replica.execute('SELECT COUNT(*) FROM posts_post')
+        self.assertEqual(count, 1)
+
+
+class ReplicaFreshnessTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.primary = os.path.join(directory.name, 'db.sqlite3')
+        self.replica = os.path.join(directory.name, 'replica.sqlite3')
+
+    def touch(self, path, seconds):
+        with open(path, 'a'):
+            pass
+        os.utime(path, (seconds, seconds))
+
+    def test_replica_stale_after_write(self):
+        self.touch(self.primary, 100)
+        self.assertFalse(is_fresh(self.primary, self.replica))
+        self.touch(synced_path(self.replica), 200)
+        self.assertTrue(is_fresh(self.primary, self.replica))
+        # В режиме WAL запись меняет только файл -wal.
+        self.touch(f'{self.primary}-wal', 300)
+        self.assertFalse(is_fresh(self.primary, self.replica))
+
+    @override_settings(REPLICA_MAX_LAG=5)
+    def test_replica_within_max_lag(self):
+        self.touch(synced_path(self.replica), 100)
+        self.touch(f'{self.primary}-wal', 103)
+        second = 10 ** 9
+        self.assertTrue(is_fresh(
+            self.primary, self.replica, now=104 * second))
+        self.assertFalse(is_fresh(
+            self.primary, self.replica, now=106 * second))
+        # Клиент, записавший позже копии, читает из основной базы.
+        self.assertFalse(is_fresh(
+            self.primary, self.replica, since=101 * second,
+            now=104 * second))
+
+    def test_memory_database_always_fresh(self):
+        self.assertTrue(is_fresh(':memory:', self.replica))
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+
+from core import benchmark
+from core.sqlite import retry_if_locked
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SqliteTest(TestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            (cache_size,), = cursor.fetchall()
+            cursor.execute('PRAGMA busy_timeout')
+            (busy_timeout,), = cursor.fetchall()
+        self.assertEqual(cache_size, -20000)
+        self.assertEqual(busy_timeout, 5000)
+
+    @override_settings(SQLITE_LOCK_RETRIES=2, SQLITE_LOCK_BACKOFF=0)
+    def test_retry_if_locked(self):
+        calls = []
+
+        @retry_if_locked
+        def view(request, fail):
+            calls.append(request)
+            if len(calls) <= fail:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        self.assertEqual(view(request, fail=2).status_code, 200)
+        self.assertEqual(len(calls), 3)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            view(request, fail=3)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_not_retried(self):
+        view = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            retry_if_locked(view)(RequestFactory().post('/'))
+        self.assertEqual(view.call_count, 1)
+
+    @override_settings(SQLITE_LOCK_RETRIES=1, SQLITE_LOCK_BACKOFF=0)
+    def test_failed_attempt_rolled_back(self):
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        attempts = []
+
+        @retry_if_locked
+        def view(request):
+            Comment.objects.create(post=post, author=user, text='Коммент')
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+
+        view(RequestFactory().post('/'))
+        self.assertEqual(Comment.objects.count(), 1)
+
+
+class ConcurrentBenchmarkTest(TransactionTestCase):
+    def test_run_concurrent(self):
+        benchmark.seed(users=2, groups=1, posts=5, comments=5, follows=0)
+        report = benchmark.run_concurrent(workers=1, requests=4,
+                                          write_share=0.5)
+        self.assertEqual(report['requests'], 4)
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['rps'], 0)
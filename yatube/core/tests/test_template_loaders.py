@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+
+from django.template import Context, Engine
+from django.test import SimpleTestCase, override_settings
+
+from core.template_loaders import warm_up
+
+TEMPLATES = {
+    'page.html': ("{% include 'static.html' %}|{% include 'scoped.html' %}|"
+                  "{% include 'assigns.html' %}|"
+                  "{% include 'static.html' with name='другой' %}|{{ x }}"),
+    'static.html': "Привет, {{ name }}{% include 'nested.html' %}",
+    'nested.html': '!',
+    'scoped.html': '{% with name as x %}{{ x }}{% endwith %}',
+    'assigns.html': "{% firstof 'значение' as x %}{{ x }}",
+    'loop.html': "{% include 'loop.html' %}",
+}
+
+
+class InliningLoaderTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        for name, source in TEMPLATES.items():
+            with open(os.path.join(cls.directory, name), 'w') as file:
+                file.write(source)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def engine(self, loader):
+        return Engine(dirs=[self.directory], loaders=[
+            (loader, ['django.template.loaders.filesystem.Loader'])])
+
+    def test_static_includes_inlined(self):
+        template = self.engine('core.template_loaders.Loader').get_template(
+            'page.html')
+        self.assertNotIn("include 'static.html' %}", template.source)
+        self.assertNotIn("include 'scoped.html'", template.source)
+        # Шаблон с присваиванием и include с аргументами остаются.
+        self.assertIn("{% include 'assigns.html' %}", template.source)
+        self.assertIn("with name='другой'", template.source)
+
+    def test_output_matches_plain_loader(self):
+        context = {'name': 'мир'}
+        expected = self.engine(
+            'django.template.loaders.cached.Loader').get_template(
+            'page.html').render(Context(context))
+        result = self.engine('core.template_loaders.Loader').get_template(
+            'page.html').render(Context(context))
+        self.assertEqual(result, expected)
+        self.assertEqual(result, 'Привет, мир!|мир|значение|Привет, другой!|')
+
+    def test_recursive_include_stops(self):
+        template = self.engine('core.template_loaders.Loader').get_template(
+            'loop.html')
+        self.assertIn("{% include 'loop.html' %}", template.source)
+
+    def test_warm_up_compiles_all_templates(self):
+        engine = self.engine('core.template_loaders.Loader')
+        with override_settings(TEMPLATE_CACHE=False):
+            self.assertEqual(warm_up(engine), 0)
+        with override_settings(TEMPLATE_CACHE=True):
+            self.assertEqual(warm_up(engine), len(TEMPLATES))
+        cache = engine.template_loaders[0].get_template_cache
+        self.assertIn('page.html', cache)
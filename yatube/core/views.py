@@ -1,3 +1,4 @@
+from django.http import JsonResponse
 from django.shortcuts import render
 
 
@@ -7,4 +8,15 @@ def page_not_found(request, exception):
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    # Клиенту API нужна JSON-ошибка, а не HTML-страница.
+    match = getattr(request, 'resolver_match', None)
+    if match and match.namespace == 'api':
+        return JsonResponse(
+            {'detail': 'Не пройдена проверка CSRF: передайте cookie '
+                       'csrftoken и её значение в заголовке X-CSRFToken.'},
+            status=403, json_dumps_params={'ensure_ascii': False})
+    return render(request, 'core/403csrf.html', status=403)
+
+
+def too_many_requests(request):
+    return render(request, 'core/429.html', status=429)
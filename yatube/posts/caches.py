@@ -0,0 +1,93 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.routers import require_synced
+from .models import Group
+
+VERSION_KEY = 'posts:version:{}'
+
+
+def _new_version():
+    # Время в наносекундах: версия, заведённая заново после вытеснения
+    # из кэша, не совпадёт ни с одной из выданных раньше.
+    return time.time_ns()
+
+
+def get_versions(*scopes):
+    """Версии областей страниц, недостающие заводятся заново.
+
+    Версия - время сдвига: если реплика запроса скопирована раньше,
+    дальше запрос читает из основной базы.
+    """
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), settings.CACHE_VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    require_synced(max(versions.values(), default=0))
+    return [versions[key] for key in keys]
+
+
+def _set_versions(scopes):
+    cache.set_many(
+        {VERSION_KEY.format(scope): _new_version() for scope in scopes},
+        settings.CACHE_VERSION_TIMEOUT)
+
+
+def bump_versions(*scopes):
+    """Сдвигает версии областей: их фрагменты и ETag устаревают.
+
+    В транзакции версии сдвигаются ещё раз после коммита: читатель, который
+    до коммита закэшировал старые строки под новой версией, иначе отдавал
+    бы их до следующей записи.
+    """
+    _set_versions(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_versions(scopes))
+
+
+def get_feed_version():
+    """Текущая версия ленты, входит в ключи кэша её фрагментов."""
+    return get_versions('feed')[0]
+
+
+def bump_feed_version():
+    """Сдвигает версию ленты, старые фрагменты больше не читаются."""
+    bump_versions('feed')
+
+
+def invalidate_post(post, group_ids=()):
+    """Сдвигает версии всех страниц, на которых виден пост.
+
+    group_ids - группы, в которых пост был до правки.
+    """
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(
+        pk__in=group_ids).values_list('slug', flat=True) if group_ids else []
+    bump_versions(
+        'feed',
+        f'post:{post.pk}',
+        f'author:{post.author_id}',
+        f'profile:{post.author.username}',
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+def invalidate_author(user):
+    """Сдвигает версии страниц, на которых видно имя автора.
+
+    Карточки сбрасываются отдельно, а ленты, профиль, группы и страницы
+    постов автора кэшируют фрагменты и ETag по своим версиям.
+    """
+    slugs = Group.objects.filter(
+        posts__author=user).values_list('slug', flat=True).distinct()
+    bump_versions(
+        'feed',
+        f'author:{user.pk}',
+        f'profile:{user.username}',
+        *(f'group:{slug}' for slug in slugs),
+    )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caches import bump_versions, get_versions
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_KEY = 'posts:card:{version}:{pk}:{updated}'
+
+
+def card_key(post, version):
+    return CARD_KEY.format(
+        version=version, pk=post.pk, updated=post.updated_at.timestamp())
+
+
+def render_cards(posts):
+    """HTML карточек постов страницы.
+
+    Все карточки читаются из кэша одним get_many, недостающие рендерятся
+    и сохраняются одним set_many. Правка поста меняет updated_at, а с ним
+    и ключ, поэтому сбрасывается только его карточка.
+    """
+    posts = list(posts)
+    version = get_versions('cards')[0]
+    keys = [card_key(post, version) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def invalidate_cards():
+    """Сбрасывает все карточки: изменились группа или имя автора."""
+    bump_versions('cards')
@@ -0,0 +1,104 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _count(queryset, field):
+    """Коррелированный подзапрос COUNT(*) по полю field = OuterRef('pk')."""
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), 0)
+
+
+def annotate_stats(users):
+    return users.annotate(
+        real_posts_count=_count(Post.objects.all(), 'author'),
+        real_followers_count=_count(Follow.objects.all(), 'author'),
+        real_following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def get_author_stats(user):
+    """Счётчики пользователя, при отсутствии строки считает их заново."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return _create_stats(user.pk)
+
+
+def _create_stats(user_id):
+    counted = annotate_stats(User.objects.filter(pk=user_id)).first()
+    if counted is None:
+        return None
+    stats, _ = AuthorStats.objects.get_or_create(user_id=user_id, defaults={
+        field: getattr(counted, f'real_{field}') for field in STATS_FIELDS
+    })
+    return stats
+
+
+def change_author_stats(user_id, create=True, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas.
+
+    Если строки нет, при create она считается заново по таблицам: запись,
+    вызвавшая сдвиг, уже в базе. При удалениях строку не создаём - её
+    владелец может удаляться каскадом в той же транзакции.
+    """
+    updates = {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    updated = AuthorStats.objects.filter(user_id=user_id).update(**updates)
+    if not updated and create:
+        _create_stats(user_id)
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0))
+
+
+def reconcile_author_stats(batch_size=1000):
+    """Исправляет расхождения счётчиков, возвращает число исправленных."""
+    fixed = 0
+    to_create, to_update = [], []
+    users = annotate_stats(User.objects.select_related('stats'))
+    for user in users.iterator(chunk_size=batch_size):
+        real = {field: getattr(user, f'real_{field}')
+                for field in STATS_FIELDS}
+        if not hasattr(user, 'stats'):
+            to_create.append(AuthorStats(user_id=user.pk, **real))
+        elif any(getattr(user.stats, field) != value
+                 for field, value in real.items()):
+            for field, value in real.items():
+                setattr(user.stats, field, value)
+            to_update.append(user.stats)
+        if len(to_create) + len(to_update) >= batch_size:
+            fixed += _save_stats(to_create, to_update)
+            to_create, to_update = [], []
+    return fixed + _save_stats(to_create, to_update)
+
+
+def _save_stats(to_create, to_update):
+    AuthorStats.objects.bulk_create(to_create)
+    AuthorStats.objects.bulk_update(to_update, STATS_FIELDS)
+    return len(to_create) + len(to_update)
+
+
+def reconcile_comment_counts(batch_size=1000):
+    posts = Post.objects.order_by().only('comment_count').annotate(
+        real_comment_count=_count(Comment.objects.all(), 'post'))
+    fixed = 0
+    drifted = []
+    for post in posts.iterator(chunk_size=batch_size):
+        if post.comment_count != post.real_comment_count:
+            post.comment_count = post.real_comment_count
+            drifted.append(post)
+        if len(drifted) >= batch_size:
+            Post.objects.bulk_update(drifted, ['comment_count'])
+            fixed += len(drifted)
+            drifted = []
+    Post.objects.bulk_update(drifted, ['comment_count'])
+    return fixed + len(drifted)
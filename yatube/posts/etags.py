@@ -0,0 +1,93 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from core.routers import replica_behind
+from .caches import get_feed_version, get_versions
+from .models import Group, Post, User
+
+AUTHOR_OF_KEY = 'posts:author_of:{}'
+EXISTS_KEY = 'posts:exists:{}'
+
+
+def conditional(etag_func):
+    """Отвечает 304 без построения страницы, если ETag не изменился.
+
+    Страницы персональные, поэтому кэшировать их может только браузер
+    и только с проверкой ETag при каждом запросе.
+    """
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+        return cache_control(private=True, no_cache=True)(view)
+    return decorator
+
+
+def make_etag(request, *versions):
+    # ETag слабый: в формах страницы каждый раз новый CSRF-токен.
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    raw = ':'.join(map(str, (viewer, request.get_full_path(), *versions)))
+    return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def author_of(post_id):
+    """Автор поста не меняется, поэтому хранится в кэше; нет поста - None."""
+    key = AUTHOR_OF_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(
+            pk=post_id).values_list('author_id', flat=True).first()
+        if author_id is not None:
+            cache.set(key, author_id, settings.CACHE_VERSION_TIMEOUT)
+    return author_id
+
+
+def _exists(scope, queryset):
+    """Есть ли объект области. Запоминается только найденный: адреса
+    несуществующих страниц не должны занимать кэш, а с отстающей реплики
+    можно найти уже удалённый."""
+    key = EXISTS_KEY.format(scope)
+    if cache.get(key):
+        return True
+    found = queryset.exists()
+    if found and not replica_behind():
+        cache.set(key, True, settings.CACHE_VERSION_TIMEOUT)
+    return found
+
+
+def forget_exists(scope):
+    cache.delete(EXISTS_KEY.format(scope))
+
+
+# Без ETag (None) view отвечает как обычно, для несуществующего объекта -
+# 404, и версия его области в кэше не заводится.
+def index_etag(request):
+    return make_etag(request, get_feed_version())
+
+
+def group_exists(slug):
+    return _exists(f'group:{slug}', Group.objects.filter(slug=slug))
+
+
+def group_etag(request, slug):
+    if not group_exists(slug):
+        return None
+    return make_etag(request, *get_versions(f'group:{slug}'))
+
+
+def profile_etag(request, username):
+    scope = f'profile:{username}'
+    if not _exists(scope, User.objects.filter(username=username)):
+        return None
+    # Версия 'groups' сдвигается при правке групп: на странице их ссылки.
+    return make_etag(request, *get_versions(scope, 'groups'))
+
+
+def post_etag(request, post_id):
+    author_id = author_of(post_id)
+    if author_id is None:
+        return None
+    return make_etag(request, *get_versions(
+        f'post:{post_id}', f'author:{author_id}', 'groups'))
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -11,6 +14,21 @@ class PostForm(forms.ModelForm):
                       'group': 'Группа, к которой будет относиться пост'}
         fields = ['text', 'group', 'image']
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        limit = settings.POST_IMAGE_MAX_SIZE
+        if isinstance(image, UploadedFile) and image.size > limit:
+            raise forms.ValidationError(
+                f'Картинка больше {limit // (1024 * 1024)} МБ.')
+        return image
+
+    def save(self, commit=True):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # Готовое имя в хранилище: модель не перезапишет файл.
+            self.instance.image = images.store(image)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
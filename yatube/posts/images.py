@@ -0,0 +1,155 @@
+"""Обработка загружаемых картинок постов.
+
+Загрузка кладётся в каталог posts/<хэш содержимого>/ под именем
+original.<расширение формата>: повторная загрузка тех же байтов под любым
+именем не пишет ничего нового. Картинка поворачивается по EXIF,
+уменьшается до POST_IMAGE_MAX_DIMENSION и пересохраняется без метаданных.
+Рядом лежат варианты для srcset: <ширина>.webp и <ширина>.jpg.
+"""
+import hashlib
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+UPLOAD_DIR = 'posts'
+HASH_LENGTH = 24
+VARIANTS_KEY = 'posts:variants:{}'
+VARIANT_RE = re.compile(r'^(\d+)\.(webp|jpg)$')
+HASHED_NAME_RE = re.compile(
+    rf'^{UPLOAD_DIR}/[0-9a-f]{{{HASH_LENGTH}}}/[^/]+$')
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+VARIANT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+# Расширения форматов, у которых оно не совпадает с названием.
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'TIFF': 'tif'}
+
+
+def content_hash(upload):
+    """Хэш содержимого, файл читается кусками."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def original_name(directory, image_format):
+    """Имя оригинала в каталоге хэша; от имени загрузки не зависит."""
+    ext = FORMAT_EXTENSIONS.get(image_format, image_format.lower())
+    return f'{directory}/original.{ext}'
+
+
+def encode(image, image_format):
+    buffer = BytesIO()
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    if image.info.get('icc_profile'):
+        # Цветовой профиль не метаданные: без него поплывут цвета.
+        options['icc_profile'] = image.info['icc_profile']
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def downscale(image, size):
+    """Копия картинки не больше size по каждой стороне."""
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    return image
+
+
+def resize_to_width(image, width):
+    """Копия картинки шириной width; высота - по пропорциям."""
+    if width >= image.width:
+        return image.copy()
+    height = max(image.height * width // image.width, 1)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def variant_widths(width):
+    widths = [size for size in settings.POST_IMAGE_WIDTHS if size < width]
+    return widths + [min(width, settings.POST_IMAGE_WIDTHS[-1])]
+
+
+def save_variants(directory, image):
+    """Варианты для srcset; каждый формат и ширина пишутся один раз."""
+    rgba = image.convert('RGBA')
+    rgb = Image.new('RGB', rgba.size, 'white')
+    rgb.paste(rgba, mask=rgba.getchannel('A'))
+    sources = {'WEBP': rgba, 'JPEG': rgb}
+    widths = variant_widths(image.width)
+    for width in widths:
+        for ext, image_format in VARIANT_FORMATS:
+            # srcset описывает варианты шириной: высота не ограничена,
+            # иначе портретные варианты вышли бы уже своего имени.
+            variant = resize_to_width(sources[image_format], width)
+            name = f'{directory}/{width}.{ext}'
+            if not default_storage.exists(name):
+                default_storage.save(
+                    name, ContentFile(encode(variant, image_format)))
+    cache.set(VARIANTS_KEY.format(directory), widths, None)
+
+
+def store(upload):
+    """Сохраняет загрузку в хранилище и возвращает её имя.
+
+    Если такие байты уже загружали, возвращается готовый файл.
+    """
+    directory = f'{UPLOAD_DIR}/{content_hash(upload)}'
+    # Открытие читает только заголовок, картинка декодируется ниже.
+    image = Image.open(upload)
+    # Снимки телефонов Pillow читает как MPO - это тот же JPEG.
+    image_format = 'JPEG' if image.format == 'MPO' else image.format
+    name = original_name(directory, image_format)
+    if default_storage.exists(name):
+        return name
+    if getattr(image, 'is_animated', False):
+        # Анимацию пересохранять дорого, кладём как есть и без вариантов.
+        return default_storage.save(name, upload)
+    size = settings.POST_IMAGE_MAX_DIMENSION
+    # JPEG сразу декодируется в уменьшенном масштабе.
+    image.draft(image.mode, (size, size))
+    image = downscale(ImageOps.exif_transpose(image), size)
+    name = default_storage.save(
+        name, ContentFile(encode(image, image_format)))
+    if not get_variants(name):
+        save_variants(directory, image)
+    return name
+
+
+def get_variants(name):
+    """Ширины готовых вариантов картинки; для старых загрузок пусто."""
+    if not name or not HASHED_NAME_RE.match(name):
+        return []
+    directory = os.path.dirname(name)
+    key = VARIANTS_KEY.format(directory)
+    widths = cache.get(key)
+    if widths is None:
+        # Содержимое каталога хэша не меняется, кэшируем без срока.
+        files = default_storage.listdir(directory)[1]
+        widths = sorted({
+            int(match.group(1)) for match in map(VARIANT_RE.match, files)
+            if match
+        })
+        cache.set(key, widths, None)
+    return widths
+
+
+def variant_url(name, width, ext):
+    return default_storage.url(f'{os.path.dirname(name)}/{width}.{ext}')
+
+
+def srcset(name, ext):
+    return ', '.join(
+        f'{variant_url(name, width, ext)} {width}w'
+        for width in get_variants(name)
+    )
@@ -0,0 +1,32 @@
+"""Запомненные адреса страниц приложения posts.
+
+reverse() на каждый вызов перебирает шаблоны адресов и проверяет
+результат регулярным выражением; лента зовёт его для каждого поста
+и комментария. Готовые адреса хранятся в LRU по имени и аргументам,
+с учётом текущего urlconf и префикса скрипта.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+NAMESPACE = 'posts'
+
+
+@lru_cache(maxsize=settings.POST_URL_CACHE_SIZE)
+def _reverse(urlconf, prefix, viewname, args):
+    return reverse(viewname, urlconf=urlconf, args=args)
+
+
+def post_url(name, *args):
+    """Адрес страницы posts:<name> с позиционными аргументами."""
+    return _reverse(get_urlconf(), get_script_prefix(),
+                    f'{NAMESPACE}:{name}', args)
+
+
+@receiver(setting_changed)
+def clear_post_urls(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        _reverse.cache_clear()
@@ -0,0 +1,75 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post
+from posts.paginators import CursorPaginator
+from posts.timelines import TIMELINE_ORDER, timeline_posts
+
+User = get_user_model()
+
+# SQLite: "SCAN posts_post" без индекса, PostgreSQL: "Seq Scan on ...".
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$|Seq Scan on')
+# Проход по индексу целиком допустим только для запроса с LIMIT.
+INDEX_SCAN = re.compile(r'\bSCAN (TABLE )?\w+ USING (COVERING )?INDEX')
+SORT = re.compile(r'TEMP B-TREE FOR ORDER BY|Sort Key')
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов лент и сообщает о полных '
+            'просмотрах таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--warn-only', action='store_true',
+            help='Не завершаться с ошибкой при полных просмотрах.')
+
+    def feed_queries(self):
+        group = Group.objects.first() or Group(pk=0)
+        author = User.objects.first() or User(pk=0)
+        cursor = {
+            'value': timezone.now(), 'pk': 0, 'number': 2, 'reverse': False,
+        }
+        feeds = {
+            'index': (Post.objects.for_feed(), {}),
+            'group_list': (group.posts.for_feed(), {}),
+            'profile': (author.posts.for_feed(), {}),
+            'follow_index': (timeline_posts(author), TIMELINE_ORDER),
+        }
+        for name, (posts, order) in feeds.items():
+            paginator = CursorPaginator(
+                posts, settings.POSTS_ON_PAGE, **order)
+            yield name, paginator.object_list[:settings.POSTS_ON_PAGE]
+            yield f'{name} (cursor)', paginator.cursor_queryset(cursor)
+        # Те же запросы, что keyset_page в posts.views.comment_page:
+        # на строку больше страницы, чтобы узнать о следующей.
+        comments = CursorPaginator(
+            Comment.objects.filter(post_id=0).select_related('author'),
+            settings.COMMENTS_ON_PAGE + 1, key_field='created')
+        yield ('post_detail comments',
+               comments.object_list[:settings.COMMENTS_ON_PAGE + 1])
+        yield ('post_detail comments (cursor)',
+               comments.cursor_queryset(cursor))
+
+    def handle(self, *args, **options):
+        full_scans = 0
+        for name, queryset in self.feed_queries():
+            plan = queryset.explain()
+            unbounded = queryset.query.high_mark is None
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in plan.splitlines():
+                if FULL_SCAN.search(line) or (
+                        unbounded and INDEX_SCAN.search(line)):
+                    full_scans += 1
+                    self.stdout.write(self.style.ERROR(f'  {line}'))
+                elif SORT.search(line):
+                    self.stdout.write(self.style.WARNING(f'  {line}'))
+                else:
+                    self.stdout.write(f'  {line}')
+        if full_scans and not options['warn_only']:
+            raise CommandError(f'Полных просмотров таблиц: {full_scans}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Полных просмотров таблиц: {full_scans}'))
@@ -0,0 +1,41 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки '
+            'в JSON Lines или CSV, не загружая таблицы в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл .jsonl ("-" - стандартный вывод) или каталог для CSV.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl')
+        parser.add_argument(
+            '--media', help='Каталог, куда скопировать картинки постов.')
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Число потоков копирования картинок.')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.')
+
+    def handle(self, *args, **options):
+        begin = time.perf_counter()
+        records = transfer.export_data(
+            transfer.export_records(options['batch_size']),
+            options['media'], options['workers'])
+        if options['format'] == 'csv':
+            written = transfer.write_csv(options['path'], records)
+        elif options['path'] == '-':
+            written = transfer.write_jsonl(sys.stdout, records)
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                written = transfer.write_jsonl(file, records)
+        elapsed = time.perf_counter() - begin
+        self.stderr.write(f'Выгружено записей: {written} за {elapsed:.1f} с')
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из JSON Lines '
+            'или CSV пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл .jsonl ("-" - стандартный ввод) или каталог с CSV.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl')
+        parser.add_argument(
+            '--media', help='Каталог, откуда скопировать картинки постов.')
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Число потоков копирования картинок.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки bulk_create.')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс.')
+
+    def handle(self, *args, **options):
+        begin = time.perf_counter()
+        importer = transfer.Importer(
+            options['batch_size'], options['media'], options['workers'])
+        if options['format'] == 'csv':
+            processed = importer.run(transfer.read_csv(options['path']))
+        elif options['path'] == '-':
+            processed = importer.run(transfer.read_jsonl(sys.stdin))
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                processed = importer.run(transfer.read_jsonl(file))
+        if not options['no_rebuild']:
+            importer.rebuild_derived()
+        elapsed = time.perf_counter() - begin
+        summary = ', '.join(
+            f'{model}: {count}' for model, count in processed.items())
+        self.stdout.write(
+            f'Обработано записей - {summary}; новых пользователей: '
+            f'{importer.created_users}; с новым id: {importer.remapped}; '
+            f'картинок скопировано: '
+            f'{importer.images.copied}, с ошибкой: {importer.images.failed}; '
+            f'{elapsed:.1f} с'
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_author_stats, reconcile_comment_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки для чтения и bulk_update.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stats = reconcile_author_stats(batch_size)
+        comments = reconcile_comment_counts(batch_size)
+        self.stdout.write(
+            f'Исправлено счётчиков авторов: {stats}, '
+            f'счётчиков комментариев: {comments}'
+        )
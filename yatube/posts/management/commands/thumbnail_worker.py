@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import claim_tasks, process
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры из очереди ThumbnailTask.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков, строящих миниатюры.')
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь один раз и выйти.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                names = claim_tasks(workers * 10)
+                if names:
+                    if workers > 1:
+                        results = list(pool.map(process, names))
+                    else:
+                        results = [process(name) for name in names]
+                    self.stdout.write(
+                        f'Построено миниатюр: {results.count(True)}, '
+                        f'ошибок: {results.count(False)}'
+                    )
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate, needs_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Заранее строит миниатюры ленты для всех картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков, строящих миниатюры.')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct().iterator()
+        missing = (name for name in names if needs_thumbnail(name))
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(generate, missing))
+        else:
+            results = [generate(name) for name in missing]
+        self.stdout.write(
+            f'Построено миниатюр: {results.count(True)}, '
+            f'ошибок: {results.count(False)}'
+        )
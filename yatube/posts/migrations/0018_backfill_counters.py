@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def counts(queryset, field):
+    """Словарь {значение field: число строк} одним GROUP BY."""
+    return dict(queryset.order_by().values_list(field).annotate(Count('pk')))
+
+
+def backfill_comment_counts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    real = counts(Comment.objects.all(), 'post')
+    drifted = []
+    for post in Post.objects.only('comment_count').iterator(BATCH_SIZE):
+        if post.comment_count != real.get(post.pk, 0):
+            post.comment_count = real.get(post.pk, 0)
+            drifted.append(post)
+    Post.objects.bulk_update(drifted, ['comment_count'], BATCH_SIZE)
+
+
+def backfill_author_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    posts = counts(Post.objects.all(), 'author')
+    followers = counts(Follow.objects.all(), 'author')
+    following = counts(Follow.objects.all(), 'user')
+    # Строки, созданные сигналами после 0014, уже считаются на лету.
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    AuthorStats.objects.bulk_create([
+        AuthorStats(
+            user_id=pk,
+            posts_count=posts.get(pk, 0),
+            followers_count=followers.get(pk, 0),
+            following_count=following.get(pk, 0),
+        )
+        for pk in missing.iterator(BATCH_SIZE)
+    ], BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_comment_counts, migrations.RunPython.noop),
+        migrations.RunPython(
+            backfill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,225 @@
+import base64
+import binascii
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+MAX_INT = 2 ** 63 - 1
+
+logger = logging.getLogger(__name__)
+
+
+def approximate_count(queryset, key):
+    """Число объектов: точное до порога, выше - из кэша.
+
+    Точный подсчёт ограничен LIMIT и стоит не больше порога. Для больших
+    лент значение хранится в кэше без срока. Устаревшее значение
+    отдаётся сразу, а пересчитывает его фоновый поток, запущенный
+    запросом, который получил блокировку. Без значения в кэше считаем
+    в запросе: отдать нечего.
+    """
+    limit = settings.FEED_EXACT_COUNT_LIMIT
+    bounded = queryset.order_by().values('pk')[:limit + 1].count()
+    if bounded <= limit:
+        return bounded
+    cached = cache.get(key)
+    if cached is None:
+        return _refresh_count(queryset, key)
+    count, fresh_until = cached
+    if (fresh_until <= time.time()
+            and cache.add(f'{key}:lock', True, settings.FEED_COUNT_TIMEOUT)):
+        _refresh_in_background(queryset, key)
+    return count
+
+
+def _refresh_count(queryset, key):
+    try:
+        count = queryset.count()
+        fresh_until = time.time() + settings.FEED_COUNT_TIMEOUT
+        cache.set(key, (count, fresh_until), None)
+    finally:
+        cache.delete(f'{key}:lock')
+    return count
+
+
+def _refresh_in_background(queryset, key):
+    def run():
+        try:
+            _refresh_count(queryset, key)
+        except Exception:
+            logger.exception('Не удалось пересчитать %s', key)
+        finally:
+            # Соединение потока само не закроется.
+            connections.close_all()
+    threading.Thread(target=run, name='feed-count', daemon=True).start()
+
+
+def encode_cursor(value, pk, number, reverse=False):
+    """Упаковывает позицию в ленте в непрозрачный токен для `?cursor=`."""
+    payload = json.dumps(
+        {'v': value.isoformat(), 'pk': pk, 'n': number, 'r': reverse},
+        separators=(',', ':'),
+    )
+    token = base64.urlsafe_b64encode(payload.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = parse_datetime(payload['v'])
+        cursor = {
+            'value': value,
+            'pk': int(payload['pk']),
+            'number': max(int(payload['n']), 1),
+            'reverse': bool(payload['r']),
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, OverflowError):
+        return None
+    if cursor['value'] is None:
+        return None
+    # pk и номер уходят в запрос: больше 64 бит база не примет.
+    if not (abs(cursor['pk']) <= MAX_INT and cursor['number'] < MAX_INT):
+        return None
+    return cursor
+
+
+def keyset_page(queryset, limit, token=None, key_field='pub_date',
+                tie_field='pk'):
+    """Страница после курсора без COUNT и номеров страниц.
+
+    Возвращает объекты и курсор следующей страницы (или None);
+    для битого токена - None вместо пары.
+    """
+    # Лишний объект показывает, есть ли следующая страница.
+    paginator = CursorPaginator(
+        queryset, limit + 1, key_field=key_field, tie_field=tie_field)
+    if token:
+        cursor = decode_cursor(token)
+        if cursor is None or cursor['reverse']:
+            return None
+        items = list(paginator.cursor_queryset(cursor))
+    else:
+        items = list(paginator.object_list[:limit + 1])
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(
+        getattr(last, key_field), getattr(last, tie_field), 1)
+
+
+class WindowedPaginator(Paginator):
+    """Пагинатор, чьи страницы знают окно номеров для навигации."""
+
+    def page(self, number):
+        page = super().page(number)
+        page.page_window = self.get_page_window(page.number)
+        return page
+
+    def get_page_window(self, number, on_each_side=2):
+        """Номера страниц для навигации: края и соседи, None - пропуск."""
+        last = self.num_pages
+        numbers = {1, last}.union(range(
+            max(number - on_each_side, 1),
+            min(number + on_each_side, last) + 1,
+        ))
+        window = []
+        previous = 0
+        for i in sorted(numbers):
+            if i - previous > 1:
+                window.append(None)
+            window.append(i)
+            previous = i
+        return window
+
+
+class CursorPaginator(WindowedPaginator):
+    """Пагинатор по ключу (key_field, pk) вместо OFFSET.
+
+    Страницы, открытые по курсору, выбираются условием WHERE по индексу,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Старые ссылки вида `?page=N` обслуживаются обычным OFFSET.
+    С count_key число объектов считается через approximate_count.
+    tie_field различает объекты с одинаковым key_field, по умолчанию pk.
+    """
+
+    def __init__(self, object_list, per_page, key_field='pub_date',
+                 count_key=None, tie_field='pk', **kwargs):
+        self.key_field = key_field
+        self.tie_field = tie_field
+        self.count_key = count_key
+        object_list = object_list.order_by(f'-{key_field}', f'-{tie_field}')
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return approximate_count(self.object_list, self.count_key)
+
+    def page(self, number):
+        page = super().page(number)
+        self._prepare_page(page)
+        return page
+
+    def cursor_queryset(self, cursor):
+        """Запрос одной страницы после (или до) позиции курсора."""
+        key, tie = self.key_field, self.tie_field
+        if cursor['reverse']:
+            condition = (
+                Q(**{f'{key}__gt': cursor['value']})
+                | Q(**{key: cursor['value'], f'{tie}__gt': cursor['pk']})
+            )
+            window = self.object_list.filter(condition).order_by(key, tie)
+        else:
+            condition = (
+                Q(**{f'{key}__lt': cursor['value']})
+                | Q(**{key: cursor['value'], f'{tie}__lt': cursor['pk']})
+            )
+            window = self.object_list.filter(condition)
+        return window[:self.per_page]
+
+    def get_cursor_page(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return None
+        object_list = list(self.cursor_queryset(cursor))
+        if cursor['reverse']:
+            object_list.reverse()
+            if len(object_list) < self.per_page:
+                return self.page(1)
+        elif not object_list:
+            return self.get_page(cursor['number'])
+        page = Page(object_list, cursor['number'], self)
+        page.page_window = self.get_page_window(page.number)
+        self._prepare_page(page)
+        return page
+
+    def _prepare_page(self, page):
+        page.object_list = list(page.object_list)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if not page.object_list:
+            return
+        first, last = page.object_list[0], page.object_list[-1]
+        page.next_cursor = encode_cursor(
+            getattr(last, self.key_field), getattr(last, self.tie_field),
+            page.number + 1)
+        if page.number > 1:
+            page.previous_cursor = encode_cursor(
+                getattr(first, self.key_field), getattr(first, self.tie_field),
+                page.number - 1, reverse=True)
@@ -0,0 +1,149 @@
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, When
+
+from .models import Comment, Post, SearchEntry
+from .paginators import approximate_count
+from .stemmer import stem
+
+WORD = re.compile(r'\w+')
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'же',
+    'за', 'и', 'из', 'или', 'к', 'как', 'ко', 'ли', 'на', 'над', 'не',
+    'ни', 'но', 'о', 'об', 'от', 'по', 'под', 'при', 'про', 'с', 'со',
+    'то', 'у', 'что', 'это', 'the', 'and', 'of', 'to', 'in',
+))
+# Слово из текста поста весит больше слова из комментария.
+TEXT_WEIGHT = 2
+COMMENT_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    """Основы слов текста без стоп-слов."""
+    terms = []
+    for word in WORD.findall(text.lower()):
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        terms.append(stem(word)[:MAX_TERM_LENGTH])
+    return terms
+
+
+def _apply(post_id, field, counts, sign=1):
+    """Сдвигает веса field для терминов counts у поста post_id."""
+    if not counts:
+        return
+    with transaction.atomic():
+        entries = SearchEntry.objects.select_for_update().filter(
+            post_id=post_id, term__in=counts)
+        existing = {entry.term: entry for entry in entries}
+        for term, entry in existing.items():
+            value = getattr(entry, field) + sign * counts[term]
+            setattr(entry, field, max(value, 0))
+        SearchEntry.objects.bulk_update(existing.values(), [field])
+        if sign > 0:
+            SearchEntry.objects.bulk_create([
+                SearchEntry(post_id=post_id, term=term, **{field: count})
+                for term, count in counts.items() if term not in existing
+            ])
+        SearchEntry.objects.filter(
+            post_id=post_id, text_weight=0, comment_weight=0).delete()
+
+
+def index_post_text(post, old_text=None):
+    """Переиндексирует текст поста; old_text - текст до правки."""
+    if old_text is not None:
+        _apply(post.pk, 'text_weight', Counter(tokenize(old_text)), -1)
+    _apply(post.pk, 'text_weight', Counter(tokenize(post.text)))
+
+
+def index_comment(comment, sign=1):
+    _apply(comment.post_id, 'comment_weight',
+           Counter(tokenize(comment.text)), sign)
+
+
+def index_comments(comments):
+    """Индексирует пачку новых комментариев, по одному проходу на пост."""
+    per_post = {}
+    for comment in comments:
+        per_post.setdefault(comment.post_id, Counter()).update(
+            tokenize(comment.text))
+    for post_id, counts in per_post.items():
+        _apply(post_id, 'comment_weight', counts)
+
+
+def _index_batch(posts, batch_size):
+    counts = {
+        pk: {term: [count, 0]
+             for term, count in Counter(tokenize(text)).items()}
+        for pk, text in posts
+    }
+    comments = Comment.objects.filter(post_id__in=counts).values_list(
+        'post_id', 'text')
+    for post_id, text in comments.iterator(chunk_size=batch_size):
+        for term in tokenize(text):
+            counts[post_id].setdefault(term, [0, 0])[1] += 1
+    with transaction.atomic():
+        SearchEntry.objects.bulk_create(
+            SearchEntry(post_id=post_id, term=term, text_weight=text_weight,
+                        comment_weight=comment_weight)
+            for post_id, terms in counts.items()
+            for term, (text_weight, comment_weight) in terms.items()
+        )
+
+
+def rebuild_index(batch_size=500):
+    """Строит индекс заново, возвращает число проиндексированных постов.
+
+    Посты читаются пачками, комментарии пачки - одним запросом, а
+    записи пачки сохраняются в одной транзакции.
+    """
+    SearchEntry.objects.all().delete()
+    indexed = 0
+    batch = []
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.append(post)
+        if len(batch) >= batch_size:
+            _index_batch(batch, batch_size)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        _index_batch(batch, batch_size)
+        indexed += len(batch)
+    return indexed
+
+
+def search_posts(query):
+    """Посты со всеми словами запроса, по убыванию TF-IDF."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return Post.objects.none()
+    total = approximate_count(Post.objects.all(), 'posts:count:index')
+    frequencies = dict(
+        SearchEntry.objects.filter(term__in=terms).values('term')
+        .annotate(posts=Count('post')).values_list('term', 'posts')
+    )
+    if len(frequencies) < len(terms):
+        return Post.objects.none()
+    weight = (TEXT_WEIGHT * F('search_entries__text_weight')
+              + COMMENT_WEIGHT * F('search_entries__comment_weight'))
+    score = Sum(Case(
+        *(When(search_entries__term=term,
+               then=weight * math.log(1 + total / frequencies[term]))
+          for term in terms),
+        output_field=FloatField(),
+    ))
+    return (
+        Post.objects.for_feed()
+        .filter(search_entries__term__in=terms)
+        .annotate(
+            score=score,
+            matched=Count('search_entries__term', distinct=True),
+        )
+        .filter(matched=len(terms))
+        .order_by('-score', '-pub_date', '-pk')
+    )
@@ -0,0 +1,178 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import (caches, cards, counters, etags, search, thumbnails,
+               timelines)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    caches.invalidate_post(instance, [instance._initial_group_id])
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    instance._initial_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # Старый адрес группы должен отвечать 404, а страницы постов и профилей
+    # со ссылками на неё - перестать отдавать 304.
+    slugs = {instance._initial_slug, instance.slug} - {None}
+    caches.bump_versions(
+        'feed', 'groups', *(f'group:{slug}' for slug in slugs))
+    for slug in slugs:
+        etags.forget_exists(f'group:{slug}')
+    instance._initial_slug = instance.slug
+    cards.invalidate_cards()
+
+
+@receiver(post_init, sender=User)
+def remember_name(sender, instance, **kwargs):
+    instance._initial_name = _name(instance)
+
+
+def _name(user):
+    return user.__dict__.get('first_name'), user.__dict__.get('last_name')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_name(sender, instance, created, **kwargs):
+    # Вход, смена пароля и правка в админке без смены имени карточки
+    # не трогают: сброс карточек затрагивает весь сайт.
+    name = _name(instance)
+    if created or name == instance._initial_name:
+        return
+    instance._initial_name = name
+    cards.invalidate_cards()
+    caches.invalidate_author(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    caches.bump_versions(f'post:{instance.post_id}', 'comments')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    caches.bump_versions(
+        f'profile:{instance.author.username}',
+        f'profile:{instance.user.username}',
+    )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timelines.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timelines.add_author(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    timelines.remove_author(instance.user, instance.author)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_author_stats(
+        instance.author_id, create=False, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author_stats(instance.author_id, followers_count=1)
+        counters.change_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_author_stats(
+        instance.author_id, create=False, followers_count=-1)
+    counters.change_author_stats(
+        instance.user_id, create=False, following_count=-1)
+
+
+@receiver(post_delete, sender=Follow)
+def backfill_former_popular(sender, instance, **kwargs):
+    # Подключён после count_deleted_follow: счётчик уже уменьшен.
+    if timelines.is_back_under_limit(instance.author_id):
+        timelines.backfill_author(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnail(sender, instance, **kwargs):
+    if instance.image and thumbnails.needs_thumbnail(instance.image):
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_init, sender=Post)
+@receiver(post_init, sender=Comment)
+def remember_indexed_text(sender, instance, **kwargs):
+    # Отложенное поле не читаем, иначе каждая загрузка стоит запроса.
+    instance._indexed_text = instance.__dict__.get('text')
+
+
+def _text_changed(instance):
+    old_text = instance._indexed_text
+    return old_text is not None and instance.text != old_text
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, **kwargs):
+    if created:
+        search.index_post_text(instance)
+    elif _text_changed(instance):
+        search.index_post_text(instance, old_text=instance._indexed_text)
+    instance._indexed_text = instance.__dict__.get('text')
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    if created:
+        search.index_comment(instance)
+    elif _text_changed(instance):
+        search.index_comment(Comment(
+            post_id=instance.post_id, text=instance._indexed_text), -1)
+        search.index_comment(instance)
+    instance._indexed_text = instance.__dict__.get('text')
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.index_comment(instance, -1)
@@ -0,0 +1,74 @@
+"""Стеммер русского языка по алгоритму Snowball (Портера)."""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'((?<=[ая])(в|вши|вшись)|(ив|ивши|ившись|ыв|ывши|ывшись))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = (
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)'
+)
+PARTICIPLE = r'((?<=[ая])(ем|нн|вш|ющ|щ)|(ивш|ывш|ующ))'
+ADJECTIVAL = re.compile(rf'({PARTICIPLE}?{ADJECTIVE})$')
+VERB = re.compile(
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)|'
+    r'(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'(ость?)$')
+SUPERLATIVE = re.compile(r'(ейше?)$')
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, word):
+    stripped = pattern.sub('', word, count=1)
+    return stripped, stripped != word
+
+
+# Словарь языка невелик, а слова повторяются: основа считается один раз.
+@lru_cache(maxsize=65536)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+              len(word))
+    r2 = _region(word, _region(word) - 1)
+    prefix, rest = word[:rv], word[rv:]
+
+    rest, found = _cut(PERFECTIVE_GERUND, rest)
+    if not found:
+        rest, _ = _cut(REFLEXIVE, rest)
+        for pattern in (ADJECTIVAL, VERB, NOUN):
+            rest, found = _cut(pattern, rest)
+            if found:
+                break
+
+    rest, _ = _cut(re.compile('и$'), rest)
+
+    r2_in_rest = max(r2 - rv, 0)
+    match = DERIVATIONAL.search(rest)
+    if match and match.start() >= r2_in_rest:
+        rest = rest[:match.start()]
+
+    if rest.endswith('нн'):
+        rest = rest[:-1]
+    else:
+        rest, found = _cut(SUPERLATIVE, rest)
+        if found and rest.endswith('нн'):
+            rest = rest[:-1]
+        elif not found and rest.endswith('ь'):
+            rest = rest[:-1]
+    return prefix + rest
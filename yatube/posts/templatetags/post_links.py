@@ -0,0 +1,11 @@
+from django import template
+
+from ..links import post_url as build_post_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_url(name, *args):
+    """Как {% url 'posts:<name>' ... %}, но из кэша posts.links."""
+    return build_post_url(name, *args)
@@ -0,0 +1,24 @@
+from django import template
+
+from .. import images
+from ..thumbnails import get_ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_thumbnail(image):
+    return get_ready_thumbnail(image)
+
+
+@register.simple_tag
+def image_variants(image):
+    """srcset вариантов картинки или None, если их нет."""
+    widths = images.get_variants(str(image))
+    if not widths:
+        return None
+    return {
+        'webp': images.srcset(image.name, 'webp'),
+        'jpg': images.srcset(image.name, 'jpg'),
+        'src': images.variant_url(image.name, widths[-1], 'jpg'),
+    }
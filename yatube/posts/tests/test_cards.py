@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.test.signals import template_rendered
+from django.urls import reverse
+
+from ..caches import get_versions
+from ..cards import CARD_TEMPLATE
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {i}')
+        self.client = Client()
+        self.rendered = []
+        template_rendered.connect(self.on_render)
+        self.addCleanup(template_rendered.disconnect, self.on_render)
+
+    def on_render(self, sender, template, context, **kwargs):
+        if template.name == CARD_TEMPLATE:
+            self.rendered.append(context['post'].pk)
+
+    def get(self, name, *args):
+        self.rendered.clear()
+        response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cards_shared_between_feeds(self):
+        response = self.get('posts:profile', self.author.username)
+        self.assertEqual(len(self.rendered), 3)
+        self.assertContains(response, 'Лев Толстой', count=3)
+        self.get('posts:group_list', self.group.slug)
+        self.assertEqual(self.rendered, [])
+        self.get('posts:index')
+        self.assertEqual(self.rendered, [])
+
+    def test_edit_invalidates_only_its_card(self):
+        self.get('posts:profile', self.author.username)
+        post = Post.objects.first()
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.get('posts:profile', self.author.username)
+        self.assertEqual(self.rendered, [post.pk])
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_author_rename_invalidates_cards(self):
+        self.get('posts:profile', self.author.username)
+        self.client.force_login(self.author)
+        self.get('posts:profile', self.author.username)
+        self.assertEqual(self.rendered, [])
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Алексей'
+        author.save()
+        response = self.get('posts:profile', self.author.username)
+        self.assertEqual(len(self.rendered), 3)
+        self.assertContains(response, 'Алексей Толстой', count=3)
+
+    def test_password_change_keeps_cards(self):
+        version = get_versions('cards')
+        user = User.objects.create_user(username='reader')
+        user = User.objects.get(pk=user.pk)
+        user.set_password('new-password')
+        user.save()
+        self.author.last_login = None
+        self.author.save()
+        self.assertEqual(get_versions('cards'), version)
+
+    def test_author_rename_refreshes_cached_pages(self):
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[Post.objects.first().pk]),
+        ]
+        etags = {address: self.client.get(address)['ETag']
+                 for address in addresses}
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Алексей'
+        author.save()
+        for address in addresses:
+            response = self.client.get(
+                address, HTTP_IF_NONE_MATCH=etags[address])
+            self.assertEqual(response.status_code, 200, address)
+            self.assertContains(response, 'Алексей Толстой')
@@ -0,0 +1,29 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands import explain_feeds
+from ..models import Post
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('post_group_pub_date_idx', out.getvalue())
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
+        self.assertIn('comment_post_created_id_idx', out.getvalue())
+        self.assertIn('timeline_user_pub_date_idx', out.getvalue())
+        self.assertNotIn('TEMP B-TREE', out.getvalue())
+
+    def test_full_scan_fails_command(self):
+        command = explain_feeds.Command(stdout=StringIO())
+        command.feed_queries = lambda: [
+            ('text', Post.objects.filter(text='скан')),
+            ('unordered', Post.objects.order_by()),
+        ]
+        with self.assertRaises(CommandError):
+            command.handle(warn_only=False)
+        command.handle(warn_only=True)
@@ -0,0 +1,101 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_comment_counter(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comment_count=5)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('авторов: 2', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_migration_backfills_counters(self):
+        backfill = import_module('posts.migrations.0018_backfill_counters')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        # Так выглядит база сразу после 0014: строк и счётчиков ещё нет.
+        AuthorStats.objects.all().delete()
+        Post.objects.update(comment_count=0)
+        backfill.backfill_comment_counts(apps, None)
+        backfill.backfill_author_stats(apps, None)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        author, reader = self.stats(self.author), self.stats(self.reader)
+        self.assertEqual(
+            (author.posts_count, author.followers_count), (1, 1))
+        self.assertEqual(
+            (reader.posts_count, reader.following_count), (0, 1))
+
+    def test_pages_do_not_run_aggregates(self):
+        client = Client()
+        # На профиле остаётся только COUNT пагинатора.
+        pages = {
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 1,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 0,
+        }
+        for address, counts in pages.items():
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(address)
+                self.assertEqual(
+                    response.context['author_stats'].posts_count, 1)
+                self.assertEqual(sum(
+                    'COUNT(' in query['sql'] for query in queries), counts)
@@ -0,0 +1,168 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..caches import (VERSION_KEY, bump_versions, get_feed_version,
+                      get_versions)
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group)
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.pages = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'post': reverse('posts:post_detail', args=[self.post.id]),
+        }
+
+    def etag(self, address, client=None):
+        response = (client or self.client).get(address)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        return response['ETag']
+
+    def assertNotModified(self, address, etag):
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def assertModified(self, address, etag):
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_pages_not_modified(self):
+        for name, address in self.pages.items():
+            with self.subTest(page=name):
+                etag = self.etag(address)
+                with self.assertTemplateNotUsed('base.html'):
+                    self.assertNotModified(address, etag)
+
+    def test_not_modified_skips_database(self):
+        address = self.pages['index']
+        anonymous = Client()
+        etag = self.etag(address, anonymous)
+        with self.assertNumQueries(0):
+            response = anonymous.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_viewer_and_query(self):
+        address = self.pages['index']
+        self.assertNotEqual(self.etag(address), self.etag(address, Client()))
+        self.assertNotEqual(self.etag(address), self.etag(address + '?page=2'))
+
+    def test_new_post_invalidates_feeds(self):
+        etags = {name: self.etag(address)
+                 for name, address in self.pages.items()}
+        Post.objects.create(
+            author=self.author, text='Новый пост', group=self.group)
+        for name, address in self.pages.items():
+            with self.subTest(page=name):
+                self.assertModified(address, etags[name])
+
+    def test_comment_invalidates_post_only(self):
+        etags = {name: self.etag(address)
+                 for name, address in self.pages.items()}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.assertModified(self.pages['post'], etags['post'])
+        self.assertNotModified(self.pages['index'], etags['index'])
+        self.assertNotModified(self.pages['group'], etags['group'])
+
+    def test_follow_invalidates_profile(self):
+        etag = self.etag(self.pages['profile'])
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertModified(self.pages['profile'], etag)
+        etag = self.etag(self.pages['profile'])
+        follow.delete()
+        self.assertModified(self.pages['profile'], etag)
+
+    def test_moving_post_invalidates_old_group(self):
+        etag = self.etag(self.pages['group'])
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertModified(self.pages['group'], etag)
+
+    def test_group_rename_invalidates_pages(self):
+        etags = {name: self.etag(address)
+                 for name, address in self.pages.items()}
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        for name in ('index', 'post', 'profile'):
+            with self.subTest(page=name):
+                response = self.client.get(
+                    self.pages[name], HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, '/group/renamed/')
+        response = self.client.get(
+            self.pages['group'], HTTP_IF_NONE_MATCH=etags['group'])
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_version_survives_eviction(self):
+        version = get_feed_version()
+        cache.clear()
+        self.assertNotEqual(get_feed_version(), version)
+
+    def test_missing_pages_create_no_versions(self):
+        pages = {
+            'group': reverse('posts:group_list', args=['missing']),
+            'profile': reverse('posts:profile', args=['missing']),
+            'post': reverse('posts:post_detail', args=[self.post.id + 100]),
+            'api comments': reverse(
+                'api:comments', kwargs={'post_id': self.post.id + 100}),
+        }
+        for name, address in pages.items():
+            with self.subTest(page=name):
+                self.assertEqual(self.client.get(address).status_code, 404)
+        for scope in ('group:missing', 'profile:missing',
+                      f'post:{self.post.id + 100}', 'author:None'):
+            with self.subTest(scope=scope):
+                self.assertIsNone(cache.get(VERSION_KEY.format(scope)))
+
+    def test_versions_expire(self):
+        get_versions('group:group')
+        key = cache.make_key(VERSION_KEY.format('group:group'))
+        self.assertIsNotNone(cache._expire_info[key])
+
+
+class BumpAfterCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_bumped_again_after_commit(self):
+        with transaction.atomic():
+            bump_versions('scope')
+            # Этой версией мог воспользоваться читатель до коммита.
+            seen, = get_versions('scope')
+        self.assertNotEqual(get_versions('scope'), [seen])
+
+    def test_rollback_keeps_early_bump_only(self):
+        try:
+            with transaction.atomic():
+                bump_versions('scope')
+                seen, = get_versions('scope')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(get_versions('scope'), [seen])
@@ -7,6 +7,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from .. import writebehind
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -81,7 +82,9 @@ class PostFormTest(TestCase):
         self.assertEqual(first_post.text, form_data['text'])
         self.assertEqual(first_post.group.id, form_data['group'])
         self.assertEqual(first_post.author, self.new_user)
-        self.assertIn(uploaded.name, first_post.image.name.split('/'))
+        # Имя файла - по формату, а не по имени загрузки.
+        self.assertEqual(
+            first_post.image.name.split('/')[-1], 'original.gif')
 
     def test_can_change_post(self):
         posts_count = Post.objects.count()
@@ -116,7 +119,8 @@ class PostFormTest(TestCase):
         self.assertEqual(changed_post.text, form_data['text'])
         self.assertEqual(changed_post.group.id, form_data['group'])
         self.assertEqual(changed_post.author, self.user)
-        self.assertIn(uploaded.name, changed_post.image.name.split('/'))
+        self.assertEqual(
+            changed_post.image.name.split('/')[-1], 'original.gif')
 
     def test_can_not_create_post(self):
         posts_count = Post.objects.count()
@@ -146,6 +150,8 @@ class PostFormTest(TestCase):
             data=form_data,
             follow=True
         )
+        # С YATUBE_WRITE_BEHIND=1 комментарий сначала ждёт в очереди.
+        writebehind.queue.drain()
         self.assertEqual(Comment.objects.count(), comments_count + 1)
         self.assertEqual(Comment.objects.first().text, form_data['text'])
         self.assertEqual(Comment.objects.first().author, self.new_user)
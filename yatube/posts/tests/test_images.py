@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def photo(width=3000, height=1500, orientation=None):
+    """JPEG с EXIF, как его присылает телефон."""
+    image = Image.new('RGB', (width, height), 'red')
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        form = PostForm(
+            data={'text': 'Пост с фото'},
+            files={'image': SimpleUploadedFile(
+                name, content, content_type='image/jpeg')},
+            instance=Post(author=self.user),
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_upload_downscaled_and_stripped(self):
+        post = self.upload(photo(orientation=6))
+        self.assertRegex(
+            post.image.name, r'^posts/[0-9a-f]{24}/original\.jpg$')
+        with default_storage.open(post.image.name) as file:
+            image = Image.open(file)
+            # Поворот из EXIF применён, сами метаданные удалены.
+            self.assertEqual(image.size, (1024, 2048))
+            self.assertFalse(image.getexif())
+
+    def test_variants_for_srcset(self):
+        post = self.upload(photo())
+        self.assertEqual(images.get_variants(post.image.name),
+                         [480, 960, 1440])
+        cache.clear()
+        self.assertEqual(images.get_variants(post.image.name),
+                         [480, 960, 1440])
+        directory = os.path.dirname(post.image.name)
+        with default_storage.open(f'{directory}/480.webp') as file:
+            self.assertEqual(Image.open(file).size, (480, 240))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, f'{directory}/960.webp 960w')
+        self.assertContains(response, f'{directory}/1440.jpg 1440w')
+
+    def test_small_image_has_own_width(self):
+        post = self.upload(photo(700, 300))
+        self.assertEqual(images.get_variants(post.image.name), [480, 700])
+
+    def test_portrait_variants_have_named_width(self):
+        post = self.upload(photo(1500, 3000))
+        # Сама картинка уменьшена до 1024x2048, вариант 1440 не нужен.
+        self.assertEqual(images.get_variants(post.image.name),
+                         [480, 960, 1024])
+        directory = os.path.dirname(post.image.name)
+        for width, height in ((480, 960), (960, 1920), (1024, 2048)):
+            for ext in ('webp', 'jpg'):
+                with self.subTest(width=width, ext=ext):
+                    name = f'{directory}/{width}.{ext}'
+                    with default_storage.open(name) as file:
+                        self.assertEqual(
+                            Image.open(file).size, (width, height))
+
+    def test_same_upload_stored_once(self):
+        content = photo()
+        first = self.upload(content)
+        directory = os.path.dirname(first.image.name)
+        files = default_storage.listdir(directory)[1]
+        for name in ('photo.jpg', 'copy.jpeg'):
+            with self.subTest(name=name):
+                second = self.upload(content, name)
+                self.assertEqual(second.image.name, first.image.name)
+                self.assertEqual(
+                    default_storage.listdir(directory)[1], files)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=1024)
+    def test_large_upload_rejected(self):
+        form = PostForm(
+            data={'text': 'Пост с фото'},
+            files={'image': SimpleUploadedFile(
+                'photo.jpg', photo(), content_type='image/jpeg')},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
@@ -0,0 +1,49 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from django.urls import clear_script_prefix, reverse, set_script_prefix
+
+from ..links import _reverse, post_url
+
+
+class PostUrlTest(SimpleTestCase):
+    def setUp(self):
+        _reverse.cache_clear()
+
+    def test_same_as_reverse(self):
+        links = {
+            'index': (),
+            'post_detail': (5,),
+            'group_list': ('slug',),
+            'profile': ('имя',),
+        }
+        for name, args in links.items():
+            with self.subTest(name=name):
+                self.assertEqual(post_url(name, *args),
+                                 reverse(f'posts:{name}', args=args))
+
+    def test_memoized(self):
+        post_url('post_detail', 1)
+        post_url('post_detail', 1)
+        post_url('post_detail', 2)
+        info = _reverse.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+    def test_script_prefix(self):
+        address = post_url('post_detail', 1)
+        set_script_prefix('/yatube/')
+        try:
+            self.assertEqual(post_url('post_detail', 1), '/yatube' + address)
+        finally:
+            clear_script_prefix()
+        self.assertEqual(post_url('post_detail', 1), address)
+
+    def test_root_urlconf_change_clears_cache(self):
+        post_url('index')
+        with override_settings(ROOT_URLCONF='posts.tests.test_links'):
+            self.assertEqual(_reverse.cache_info().currsize, 0)
+
+    def test_template_tag(self):
+        template = Template(
+            "{% load post_links %}{% post_url 'post_detail' post_id %}")
+        self.assertEqual(template.render(Context({'post_id': 3})),
+                         reverse('posts:post_detail', args=[3]))
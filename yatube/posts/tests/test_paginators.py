@@ -0,0 +1,159 @@
+import base64
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import paginators
+from ..models import Post
+from ..paginators import (CursorPaginator, approximate_count, decode_cursor,
+                          encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([Post(
+            author=cls.user,
+            text='Тест пост ' + str(i)) for i in range(25)
+        ])
+
+    def setUp(self):
+        self.client = Client()
+        self.paginator = CursorPaginator(
+            Post.objects.all(), settings.POSTS_ON_PAGE)
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.first()
+        cursor = decode_cursor(encode_cursor(post.pub_date, post.pk, 3))
+        self.assertEqual(cursor['value'], post.pub_date)
+        self.assertEqual(cursor['pk'], post.pk)
+        self.assertEqual(cursor['number'], 3)
+        self.assertFalse(cursor['reverse'])
+
+    def test_broken_cursor_is_ignored(self):
+        for token in ('', 'abc', 'e30'):
+            with self.subTest(token=token):
+                self.assertIsNone(self.paginator.get_cursor_page(token))
+
+    def test_out_of_range_cursor_is_ignored(self):
+        post = Post.objects.first()
+        value = post.pub_date.isoformat()
+        payloads = (
+            f'{{"v":"{value}","pk":{post.pk},"n":Infinity,"r":false}}',
+            f'{{"v":"{value}","pk":{2 ** 64},"n":2,"r":false}}',
+            f'{{"v":"{value}","pk":{post.pk},"n":{2 ** 64},"r":false}}',
+        )
+        for payload in payloads:
+            token = base64.urlsafe_b64encode(payload.encode()).decode()
+            with self.subTest(payload=payload):
+                self.assertIsNone(decode_cursor(token))
+                response = self.client.get(
+                    reverse('posts:index'), {'cursor': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_pages_match_offset_pages(self):
+        page = self.paginator.page(1)
+        for number in range(2, self.paginator.num_pages + 1):
+            with self.subTest(number=number):
+                page = self.paginator.get_cursor_page(page.next_cursor)
+                self.assertEqual(page.number, number)
+                self.assertEqual(
+                    list(page), list(self.paginator.page(number)))
+
+    def test_previous_cursor_returns_previous_page(self):
+        second = self.paginator.get_cursor_page(
+            self.paginator.page(1).next_cursor)
+        third = self.paginator.get_cursor_page(second.next_cursor)
+        back = self.paginator.get_cursor_page(third.previous_cursor)
+        self.assertEqual(back.number, 2)
+        self.assertEqual(list(back), list(second))
+
+    def test_cursor_page_runs_no_offset_query(self):
+        token = self.paginator.page(2).next_cursor
+        with self.assertNumQueries(1):
+            page = self.paginator.get_cursor_page(token)
+            list(page)
+
+    def test_index_follows_cursor_links(self):
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': next_cursor})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.all()[
+                settings.POSTS_ON_PAGE:settings.POSTS_ON_PAGE * 2]))
+
+
+class PageCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([Post(
+            author=cls.user,
+            text='Тест пост ' + str(i)) for i in range(30)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window_elides_far_pages(self):
+        paginator = CursorPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.num_pages, 15)
+        self.assertEqual(
+            paginator.get_page_window(1), [1, 2, 3, None, 15])
+        self.assertEqual(
+            paginator.get_page_window(8), [1, None, 6, 7, 8, 9, 10, None, 15])
+        self.assertEqual(
+            paginator.get_page_window(14), [1, None, 12, 13, 14, 15])
+        self.assertEqual(paginator.page(8).page_window,
+                         paginator.get_page_window(8))
+
+    @override_settings(FEED_EXACT_COUNT_LIMIT=100)
+    def test_exact_count_under_limit(self):
+        Post.objects.first().delete()
+        self.assertEqual(approximate_count(Post.objects.all(), 'key'), 29)
+        self.assertIsNone(cache.get('key'))
+
+    @override_settings(FEED_EXACT_COUNT_LIMIT=10, FEED_COUNT_TIMEOUT=60)
+    def test_cached_count_over_limit(self):
+        self.assertEqual(approximate_count(Post.objects.all(), 'key'), 30)
+        Post.objects.first().delete()
+        self.assertEqual(approximate_count(Post.objects.all(), 'key'), 30)
+        count, _ = cache.get('key')
+        cache.set('key', (count, 0), None)
+        # Поток пересчёта не увидел бы данных незакрытой транзакции теста.
+        with mock.patch.object(paginators, '_refresh_in_background',
+                               paginators._refresh_count):
+            # Устаревшее значение отдаётся сразу, пересчёт - в фоне.
+            self.assertEqual(
+                approximate_count(Post.objects.all(), 'key'), 30)
+        self.assertEqual(approximate_count(Post.objects.all(), 'key'), 29)
+        self.assertIsNone(cache.get('key:lock'))
+
+    @override_settings(FEED_EXACT_COUNT_LIMIT=10)
+    def test_stale_count_served_while_refreshing(self):
+        cache.set('key', (50, 0), None)
+        cache.set('key:lock', True)
+        self.assertEqual(approximate_count(Post.objects.all(), 'key'), 50)
+
+    @override_settings(FEED_EXACT_COUNT_LIMIT=10)
+    def test_index_uses_cached_count(self):
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(
+            pk__in=list(Post.objects.values_list('pk', flat=True)[:10])
+        ).delete()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 30)
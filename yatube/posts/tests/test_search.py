@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, SearchEntry
+from ..search import search_posts, tokenize
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        forms = (
+            ('книга', 'книги', 'книгой', 'книгами'),
+            ('красивый', 'красивая', 'красивыми'),
+            ('бегать', 'бегала'),
+            ('длинный', 'длинная'),
+            ('ёжик', 'ежики'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_tokenize_drops_stop_words(self):
+        self.assertEqual(tokenize('Кот и собака на крыше'),
+                         [stem('кот'), stem('собака'), stem('крыше')])
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.cats = Post.objects.create(
+            author=self.user, text='Кошки любят спать. Кошка спит весь день.')
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собаки любят гулять.')
+
+    def test_search_by_word_form(self):
+        self.assertEqual(list(search_posts('кошками')), [self.cats])
+        self.assertEqual(list(search_posts('любит')),
+                         [self.dogs, self.cats])
+        self.assertEqual(list(search_posts('кошки гулять')), [])
+
+    def test_ranking_prefers_frequent_terms(self):
+        once = Post.objects.create(author=self.user, text='Одна кошка.')
+        results = list(search_posts('кошка'))
+        self.assertEqual(results, [self.cats, once])
+
+    def test_index_follows_edits_and_comments(self):
+        self.cats.text = 'Теперь про попугаев.'
+        self.cats.save()
+        self.assertEqual(list(search_posts('кошки')), [])
+        self.assertEqual(list(search_posts('попугай')), [self.cats])
+        comment = Comment.objects.create(
+            post=self.dogs, author=self.reader, text='Мой попугай тоже.')
+        self.assertEqual(list(search_posts('попугай')),
+                         [self.cats, self.dogs])
+        comment.delete()
+        self.assertEqual(list(search_posts('попугай')), [self.cats])
+
+    def test_rebuild_command(self):
+        SearchEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 2', out.getvalue())
+        self.assertEqual(list(search_posts('спать')), [self.cats])
+
+    def test_search_page(self):
+        response = Client().get(reverse('posts:search'), {'q': 'собаки'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']), [self.dogs])
+        self.assertEqual(response.context['page_query'], 'q=%D1%81%D0%BE'
+                         '%D0%B1%D0%B0%D0%BA%D0%B8&')
@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import thumbnails
+from ..models import Post, ThumbnailTask
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'),
+        )
+        self.address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def test_new_image_queued_with_placeholder(self):
+        self.assertTrue(ThumbnailTask.objects.filter(
+            name=self.post.image.name).exists())
+        response = self.client.get(self.address)
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_worker_builds_queued_thumbnails(self):
+        etag = self.client.get(self.address)['ETag']
+        out = StringIO()
+        call_command('thumbnail_worker', once=True, workers=1, stdout=out)
+        self.assertIn('Построено миниатюр: 1', out.getvalue())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertIsNotNone(thumbnails.get_ready_thumbnail(self.post.image))
+        response = self.client.get(self.address, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_warm_command_builds_missing_thumbnails(self):
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out)
+        self.assertIn('Построено миниатюр: 1', out.getvalue())
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out)
+        self.assertIn('Построено миниатюр: 0', out.getvalue())
+
+    def test_claimed_task_kept_until_built(self):
+        name = self.post.image.name
+        self.assertEqual(thumbnails.claim_tasks(10), [name])
+        # Задача остаётся в базе, но второй обработчик её не берёт.
+        self.assertTrue(ThumbnailTask.objects.filter(name=name).exists())
+        self.assertEqual(thumbnails.claim_tasks(10), [])
+        # Обработчик упал: после аренды задача снова в очереди.
+        ThumbnailTask.objects.update(available_at=timezone.now())
+        self.assertEqual(thumbnails.claim_tasks(10), [name])
+
+    def test_failed_task_requeued_with_backoff(self):
+        name = self.post.image.name
+        thumbnails.claim_tasks(10)
+        with mock.patch.object(thumbnails, 'generate', return_value=False):
+            self.assertFalse(thumbnails.process(name))
+        task = ThumbnailTask.objects.get(name=name)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(
+            task.available_at,
+            timezone.now() + timedelta(
+                seconds=settings.THUMBNAIL_RETRY_SECONDS - 5))
+        self.assertEqual(thumbnails.claim_tasks(10), [])
+
+    @override_settings(THUMBNAIL_MAX_ATTEMPTS=1)
+    def test_task_dropped_after_max_attempts(self):
+        name = self.post.image.name
+        thumbnails.claim_tasks(10)
+        with mock.patch.object(thumbnails, 'generate', return_value=False):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                thumbnails.process(name)
+        self.assertFalse(ThumbnailTask.objects.exists())
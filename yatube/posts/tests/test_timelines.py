@@ -0,0 +1,82 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry
+from ..timelines import rebuild_timeline, timeline_posts
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def test_new_post_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.stranger).exists())
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(list(timeline_posts(self.reader)), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_request(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        post = Post.objects.create(author=self.author, text='Популярный')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_posts_backfilled_when_author_drops_under_limit(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=self.stranger, author=self.author)
+        post = Post.objects.create(author=self.author, text='Популярный')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        follow.delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    def test_backfill_command_restores_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост ' + str(i))
+            for i in range(3)
+        ])
+        self.assertEqual(list(timeline_posts(self.reader)), [])
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(timeline_posts(self.reader)),
+            list(Post.objects.filter(author=self.author)))
+
+    def test_timeline_ordered_by_copied_pub_date(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        newer = Post.objects.create(author=self.author, text='Новее')
+        older = Post.objects.create(author=self.author, text='Старше')
+        Post.objects.filter(pk=older.pk).update(
+            pub_date=newer.pub_date - timedelta(days=1))
+        older.refresh_from_db()
+        rebuild_timeline(self.reader)
+        self.assertEqual(
+            TimelineEntry.objects.get(user=self.reader, post=older).pub_date,
+            older.pub_date)
+        self.assertEqual(list(timeline_posts(self.reader)), [newer, older])
@@ -5,10 +5,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import writebehind
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -255,13 +258,40 @@ class PostUrlTest(TestCase):
 
     def test_main_page_cache(self):
         response_first = self.authorized_client.get(reverse(self.main_page))
-        Post.objects.first().delete()
+        Post.objects.filter(id=Post.objects.first().id).update(
+            text='Изменено в обход сигналов')
         response_second = self.authorized_client.get(reverse(self.main_page))
         self.assertEqual(response_first.content, response_second.content)
         cache.clear()
         response_third = self.authorized_client.get(reverse(self.main_page))
         self.assertNotEqual(response_first.content, response_third.content)
 
+    def test_main_page_cache_hit_skips_posts(self):
+        self.authorized_client.get(reverse(self.main_page))
+        # Сессия и пользователь тоже в кэше: база не нужна вовсе.
+        with self.assertNumQueries(0):
+            self.authorized_client.get(reverse(self.main_page))
+
+    def test_main_page_cache_invalidated_on_write(self):
+        response_first = self.authorized_client.get(reverse(self.main_page))
+        Post.objects.first().delete()
+        response_second = self.authorized_client.get(reverse(self.main_page))
+        self.assertNotEqual(response_first.content, response_second.content)
+        group = Group.objects.get(id=self.group_1.id)
+        group.slug = 'new-slug'
+        group.save()
+        response_third = self.authorized_client.get(reverse(self.main_page))
+        self.assertContains(response_third, 'new-slug')
+
+    def test_main_page_cache_per_page(self):
+        response_first = self.authorized_client.get(reverse(self.main_page))
+        response_second = self.authorized_client.get(
+            reverse(self.main_page) + '?page=2')
+        self.assertNotEqual(response_first.content, response_second.content)
+        self.assertNotIn(
+            list(response_first.context['page_obj'])[0].text,
+            response_second.content.decode())
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -299,9 +329,12 @@ class FollowTests(TestCase):
             'username': self.author.username}))
 
     def test_follow(self):
+        # С YATUBE_WRITE_BEHIND=1 подписки сначала ждут в очереди.
+        writebehind.queue.drain()
         count_following = Follow.objects.all().count()
         self.authorized_client.get(reverse(self.post_follow, kwargs={
             'username': self.author.username}))
+        writebehind.queue.drain()
         new_count_following = Follow.objects.all().count()
         self.assertEqual(new_count_following, count_following + 1)
         follow_obj = Follow.objects.get(
@@ -335,3 +368,126 @@ class FollowTests(TestCase):
         response = self.authorized_not_follower.get(
             reverse(self.post_follow_index))
         self.assertNotContains(response, self.post)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create_posts(self, count):
+        for i in range(count):
+            Post.objects.create(
+                author=self.author,
+                group=self.group,
+                text='Тест пост ' + str(i),
+            )
+
+    def test_feed_queries_do_not_depend_on_posts_count(self):
+        # Сессия, пользователь, COUNT пагинатора и выборка постов.
+        # Профиль ещё ищет автора со счётчиками и подписку,
+        # лента подписок - популярных авторов из подписок. Группа и профиль
+        # с холодным кэшем проверяют, есть ли они, до расчёта ETag.
+        feeds = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 6,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 7,
+            reverse('posts:follow_index'): 5,
+        }
+        for count in (1, settings.POSTS_ON_PAGE):
+            Post.objects.all().delete()
+            self.create_posts(count)
+            for address, queries in feeds.items():
+                with self.subTest(address=address, count=count):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.reader_client.get(address)
+
+    def test_post_detail_queries_do_not_depend_on_comments_count(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        address = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        queries = []
+        for count in (1, 5):
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.reader, text='Комментарий')
+                for _ in range(count))
+            # Первый запрос ещё заполняет кэш ETag, считаем второй.
+            self.reader_client.get(address)
+            with CaptureQueriesContext(connection) as captured:
+                self.reader_client.get(address)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_feed_selects_author_and_group(self):
+        self.create_posts(1)
+        response = self.reader_client.get(reverse('posts:index'))
+        post = response.context['page_obj'][0]
+        with self.assertNumQueries(0):
+            post.author.get_full_name()
+            post.group.slug
+
+
+@override_settings(COMMENTS_ON_PAGE=20)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(45))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0], Comment.objects.first())
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_fragments_continue_without_duplicates(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        seen = [comment.pk for comment in response.context['comments']]
+        cursor = response.context['comments_cursor']
+        address = reverse('posts:post_comments',
+                          kwargs={'post_id': self.post.id})
+        while cursor:
+            response = self.client.get(address, {'cursor': cursor})
+            self.assertTemplateNotUsed(response, 'base.html')
+            seen.extend(comment.pk for comment in response.context['comments'])
+            cursor = response.context['comments_cursor']
+        self.assertEqual(seen, list(Comment.objects.order_by(
+            '-created', '-pk').values_list('pk', flat=True)))
+        self.assertNotContains(response, 'Показать ещё комментарии')
+
+    def test_broken_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            {'cursor': 'broken'})
+        self.assertEqual(len(response.context['comments']), 20)
@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import writebehind
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+
+@override_settings(WRITE_BEHIND=True, WRITE_BEHIND_INTERVAL=None,
+                   RATE_LIMITS={})
+class WriteBehindTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(
+            writebehind, 'queue', writebehind.WriteQueue())
+        self.queue = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def comment(self, text):
+        return self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': text})
+
+    def flush_queries(self, comments):
+        for _ in range(comments):
+            self.comment('Комментарий')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.queue.flush(), comments)
+        return len(queries)
+
+    def test_comments_saved_in_one_batch(self):
+        self.flush_queries(1)
+        # Пачка любого размера - те же запросы, что и один комментарий.
+        self.assertEqual(self.flush_queries(20), self.flush_queries(1))
+        self.assertEqual(Comment.objects.count(), 22)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 22)
+
+    def test_author_sees_pending_comment(self):
+        etag = self.client.get(self.post_url)['ETag']
+        self.comment('Мой комментарий')
+        response = self.client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Мой комментарий'])
+        other = Client()
+        other.force_login(self.author)
+        self.assertFalse(other.get(self.post_url).context['comments'])
+        self.queue.flush()
+        response = self.client.get(self.post_url)
+        self.assertEqual(len(response.context['comments']), 1)
+
+    def test_follow_is_batched_and_visible_to_follower(self):
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(self.client.get(profile).context['following'])
+        self.queue.flush()
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertTrue(self.client.get(profile).context['following'])
+
+    def test_unfollow_drops_pending_follow(self):
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_deleted_post_skipped(self):
+        self.comment('Комментарий')
+        self.post.delete()
+        self.queue.flush()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_keeps_enqueue_time(self):
+        self.comment('Первый')
+        self.comment('Второй')
+        pending = [comment.created for comment in reversed(
+            self.queue.pending_comments(self.post.id, self.reader.id))]
+        self.queue.flush()
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list(
+            'created', flat=True)), pending)
+
+    def test_failed_batch_is_requeued(self):
+        self.comment('Комментарий')
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        error = OperationalError('no such table: posts_post')
+        with mock.patch.object(writebehind, 'save_batch', side_effect=error), \
+                self.assertLogs('posts.writebehind', 'ERROR'):
+            self.assertEqual(self.queue.flush(), 0)
+        self.assertEqual(len(self.queue), 2)
+        self.assertFalse(Comment.objects.exists())
+        # Автор по-прежнему видит свои записи.
+        self.assertEqual(len(self.queue.pending_comments(
+            self.post.id, self.reader.id)), 1)
+        self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    @override_settings(WRITE_BEHIND_RETRIES=1)
+    def test_broken_row_dropped_after_retries(self):
+        self.comment('Хороший')
+        self.comment('Сломанный')
+        save_batch = writebehind.save_batch
+
+        def failing(comments, follows, unfollows):
+            if any(comment.text == 'Сломанный' for comment in comments):
+                raise ValueError('Сломанная запись')
+            return save_batch(comments, follows, unfollows)
+
+        with mock.patch.object(writebehind, 'save_batch', failing), \
+                self.assertLogs('posts.writebehind', 'ERROR') as logs:
+            self.assertEqual(self.queue.flush(), 0)
+            self.assertEqual(self.queue.flush(), 1)
+        self.assertIn('Запись выброшена из очереди', logs.output[-1])
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Хороший'])
+
+    @override_settings(WRITE_BEHIND=False)
+    def test_disabled_writes_immediately(self):
+        self.comment('Комментарий')
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(len(self.queue), 0)
@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .caches import invalidate_post
+from .images import get_variants
+from .models import Post, ThumbnailTask
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def _thumbnail_name(source):
+    """Имя миниатюры ленты так, как его вычислит sorl-thumbnail."""
+    backend = default.backend
+    options = dict(FEED_OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, FEED_GEOMETRY, options)
+
+
+def get_ready_thumbnail(image):
+    """Готовая миниатюра из хранилища sorl или None, без построения."""
+    if not image:
+        return None
+    name = _thumbnail_name(ImageFile(image))
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def needs_thumbnail(name):
+    """Картинке нужна миниатюра sorl: у неё нет вариантов и готовой копии."""
+    return not get_variants(str(name)) and not get_ready_thumbnail(name)
+
+
+def generate(name):
+    """Строит миниатюру ленты, возвращает признак успеха."""
+    try:
+        get_thumbnail(name, FEED_GEOMETRY, **FEED_OPTIONS)
+        # Вместо заглушки страницы и карточки теперь покажут миниатюру.
+        posts = Post.objects.filter(image=name)
+        posts.update(updated_at=timezone.now())
+        for post in posts.select_related('author'):
+            invalidate_post(post)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        return False
+    finally:
+        close_old_connections()
+    return True
+
+
+def schedule(name):
+    """Ставит картинку в очередь фонового обработчика миниатюр."""
+    if name:
+        ThumbnailTask.objects.get_or_create(name=name)
+
+
+def claim_tasks(limit):
+    """Забирает задачи из очереди; задачу получает один обработчик.
+
+    Задача не удаляется, а откладывается на THUMBNAIL_LEASE_SECONDS: если
+    обработчик упадёт, не построив миниатюру, её возьмёт следующий.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.THUMBNAIL_LEASE_SECONDS)
+    claimed = []
+    tasks = ThumbnailTask.objects.filter(
+        available_at__lte=now).order_by('available_at', 'pk')
+    for task in tasks[:limit]:
+        # Обновится, только если другой обработчик не забрал её раньше.
+        if ThumbnailTask.objects.filter(
+                pk=task.pk, available_at=task.available_at).update(
+                available_at=lease, attempts=F('attempts') + 1):
+            claimed.append(task.name)
+    return claimed
+
+
+def finish_task(name, built):
+    """Снимает построенную задачу, неудачную возвращает в очередь.
+
+    Повтор откладывается тем дольше, чем больше было попыток; после
+    THUMBNAIL_MAX_ATTEMPTS задача снимается, пост остаётся с заглушкой.
+    """
+    tasks = ThumbnailTask.objects.filter(name=name)
+    task = tasks.first()
+    if task is None:
+        return
+    if built:
+        tasks.delete()
+    elif task.attempts >= settings.THUMBNAIL_MAX_ATTEMPTS:
+        logger.error('Миниатюра %s не построена за %s попыток, задача снята',
+                     name, task.attempts)
+        tasks.delete()
+    else:
+        delay = settings.THUMBNAIL_RETRY_SECONDS * 2 ** (task.attempts - 1)
+        tasks.update(available_at=timezone.now() + timedelta(seconds=delay))
+
+
+def process(name):
+    """Строит миниатюру задачи и снимает её или возвращает в очередь."""
+    built = generate(name)
+    try:
+        finish_task(name, built)
+    finally:
+        close_old_connections()
+    return built
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+# Порядок ленты подписок для CursorPaginator и keyset_page: поля
+# аннотаций, которые добавляет timeline_posts.
+TIMELINE_ORDER = {'key_field': 'feed_date', 'tie_field': 'feed_pk'}
+
+
+def popular_author_ids(user):
+    """Авторы из подписок, чьи посты читаются напрямую, без раздачи."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def is_popular(author):
+    return AuthorStats.objects.filter(
+        user=author,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def is_back_under_limit(author):
+    """Автор только что перестал быть популярным: подписчиков ровно порог."""
+    return AuthorStats.objects.filter(
+        user=author,
+        followers_count=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user, author):
+    """Докладывает в ленту последние посты автора после подписки."""
+    posts = Post.objects.filter(author=author).values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user=user, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts[:settings.FEED_BACKFILL_SIZE]),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_author(author):
+    """Докладывает последние посты автора в ленты всех его подписчиков.
+
+    Пока автор был популярным, его новые посты не раздавались; когда
+    подписчиков снова не больше FEED_FANOUT_LIMIT, ленты читаются только
+    из записей, и без этого посты пропали бы из лент.
+    """
+    posts = list(Post.objects.filter(author=author).values_list(
+        'id', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    followers = Follow.objects.filter(author=author).values_list(
+        'user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in followers.iterator() for post_id, pub_date in posts),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user, author):
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def rebuild_timeline(user):
+    TimelineEntry.objects.filter(user=user).delete()
+    for follow in Follow.objects.filter(user=user).select_related('author'):
+        add_author(user, follow.author)
+
+
+def timeline_posts(user):
+    """Лента подписок: материализованные записи плюс популярные авторы.
+
+    Листать её нужно в порядке TIMELINE_ORDER. Без популярных авторов это
+    порядок индекса записей ленты, и сортировать при чтении нечего.
+    """
+    posts = Post.objects.for_feed()
+    popular = popular_author_ids(user)
+    if not popular:
+        return posts.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_pk=F('timeline_entries__post'))
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(
+        Q(pk__in=entries) | Q(author_id__in=popular)
+    ).annotate(feed_date=F('pub_date'), feed_pk=F('pk'))
@@ -0,0 +1,404 @@
+"""Потоковая выгрузка и загрузка постов, комментариев, групп и подписок.
+
+Записи идут в порядке зависимостей: группы, посты, комментарии, подписки.
+Посты и комментарии сохраняют свои id. Запись, уже загруженная раньше
+(тот же id, автор и дата), пропускается, поэтому прерванную загрузку можно
+просто запустить снова. Если id в базе занят чужой записью, загружаемая
+получает новый id, и комментарии переносятся на пост под новым id.
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .caches import bump_versions
+from .counters import reconcile_author_stats, reconcile_comment_counts
+from .models import Comment, Follow, Group, Post, User
+from .timelines import rebuild_timeline
+
+logger = logging.getLogger(__name__)
+
+MODELS = ('group', 'post', 'comment', 'follow')
+# Поле записи и путь к нему в ORM.
+FIELDS = {
+    'group': {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    },
+    'post': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comment': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follow': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+QUERYSETS = {
+    'group': Group.objects,
+    'post': Post.objects,
+    'comment': Comment.objects,
+    'follow': Follow.objects,
+}
+INT_FIELDS = ('id', 'post')
+NULLABLE_FIELDS = ('group',)
+
+
+def export_records(batch_size=2000):
+    """Все записи базы по одной, без загрузки таблиц в память."""
+    for model in MODELS:
+        fields = FIELDS[model]
+        rows = QUERYSETS[model].order_by('pk').values_list(*fields.values())
+        for values in rows.iterator(chunk_size=batch_size):
+            yield model, {
+                name: value.isoformat() if isinstance(value, datetime)
+                else value
+                for name, value in zip(fields, values)
+            }
+
+
+def write_jsonl(file, records):
+    written = 0
+    for model, row in records:
+        file.write(json.dumps({'model': model, **row}, ensure_ascii=False))
+        file.write('\n')
+        written += 1
+    return written
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            row = json.loads(line)
+            yield row.pop('model'), row
+
+
+def write_csv(directory, records):
+    """Пишет каждую модель в свой файл <model>.csv в directory."""
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    writers = {}
+    written = 0
+    try:
+        for model, row in records:
+            if model not in writers:
+                files[model] = open(os.path.join(directory, f'{model}.csv'),
+                                    'w', newline='', encoding='utf-8')
+                writers[model] = csv.DictWriter(files[model], FIELDS[model])
+                writers[model].writeheader()
+            writers[model].writerow(row)
+            written += 1
+    finally:
+        for file in files.values():
+            file.close()
+    return written
+
+
+def read_csv(directory):
+    for model in MODELS:
+        path = os.path.join(directory, f'{model}.csv')
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                for name in NULLABLE_FIELDS:
+                    if row.get(name) == '':
+                        row[name] = None
+                for name in INT_FIELDS:
+                    if name in row:
+                        row[name] = int(row[name])
+                yield model, row
+
+
+class ParallelCopy:
+    """Копирует файлы в несколько потоков.
+
+    В очереди держится не больше workers * 4 задач, поэтому память
+    не растёт вместе с числом файлов.
+    """
+
+    def __init__(self, copy, workers):
+        self.copy = copy
+        self.workers = workers
+        self.copied = 0
+        self.failed = 0
+        self.pending = deque()
+
+    def __enter__(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self.pending:
+            self._collect()
+        self.pool.shutdown()
+
+    def submit(self, name):
+        self.pending.append(self.pool.submit(self.copy, name))
+        while len(self.pending) > self.workers * 4:
+            self._collect()
+
+    def _collect(self):
+        try:
+            if self.pending.popleft().result():
+                self.copied += 1
+        except OSError as error:
+            logger.warning('Не удалось скопировать картинку: %s', error)
+            self.failed += 1
+
+
+def copy_from_storage(directory):
+    """Функция копирования картинки из хранилища в directory."""
+    def copy(name):
+        target = os.path.join(directory, name)
+        if os.path.exists(target):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with default_storage.open(name) as source, open(target, 'wb') as out:
+            shutil.copyfileobj(source, out)
+        return True
+    return copy
+
+
+def copy_to_storage(directory):
+    """Функция копирования картинки из directory в хранилище."""
+    def copy(name):
+        if default_storage.exists(name):
+            return False
+        with open(os.path.join(directory, name), 'rb') as source:
+            default_storage.save(name, File(source))
+        return True
+    return copy
+
+
+def export_data(records, media=None, workers=8):
+    """Пропускает записи дальше и копирует картинки постов в media."""
+    if media is None:
+        yield from records
+        return
+    with ParallelCopy(copy_from_storage(media), workers) as images:
+        for model, row in records:
+            if model == 'post' and row['image']:
+                images.submit(row['image'])
+            yield model, row
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now_add, чтобы даты брались из выгрузки.
+
+    Меняет поля моделей на уровне процесса, поэтому только для команд.
+    """
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загружает записи пачками через bulk_create.
+
+    Пользователи и группы ищутся по словарям username -> id и slug -> id,
+    которые читаются один раз; недостающие создаются пачкой на лету.
+    Посты, получившие новый id, запоминаются в post_ids: старый -> новый.
+    """
+
+    def __init__(self, batch_size=1000, media=None, workers=8):
+        self.batch_size = batch_size
+        self.media = media
+        self.workers = workers
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.last_post_id = Post.objects.aggregate(last=Max('id'))['last']
+        self.processed = dict.fromkeys(MODELS, 0)
+        self.created_users = 0
+        self.post_ids = {}
+        self.remapped = 0
+        # Существующие страницы, чьи версии надо сдвинуть после загрузки.
+        self.touched = {'feed'}
+
+    def run(self, records):
+        buffer = []
+        current = None
+        copy = copy_to_storage(self.media) if self.media else None
+        with explicit_dates(), ParallelCopy(copy, self.workers) as images:
+            self.images = images
+            for model, row in records:
+                if model != current or len(buffer) >= self.batch_size:
+                    self.flush(current, buffer)
+                    buffer = []
+                    current = model
+                buffer.append(row)
+            self.flush(current, buffer)
+        self.reset_sequences()
+        return self.processed
+
+    def flush(self, model, rows):
+        if not rows:
+            return
+        getattr(self, f'load_{model}s')(rows)
+        self.processed[model] += len(rows)
+
+    def user_ids(self, rows, *fields):
+        """Дозаполняет словарь пользователей, создавая недостающих."""
+        missing = {row[field] for row in rows for field in fields} - set(
+            self.users)
+        if missing:
+            new_users = [User(username=username) for username in missing]
+            for user in new_users:
+                user.set_unusable_password()
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            self.users.update(User.objects.filter(
+                username__in=missing).values_list('username', 'id'))
+            self.created_users += len(missing)
+        return self.users
+
+    def load_groups(self, rows):
+        new_groups = [Group(slug=row['slug'], title=row['title'],
+                            description=row['description'])
+                      for row in rows if row['slug'] not in self.groups]
+        Group.objects.bulk_create(new_groups, ignore_conflicts=True)
+        self.groups.update(Group.objects.filter(
+            slug__in=[group.slug for group in new_groups]
+        ).values_list('slug', 'id'))
+
+    def existing(self, model, rows, *fields):
+        """Занятые в базе id из rows и значения fields их записей."""
+        found = model.objects.filter(
+            pk__in=[row['id'] for row in rows]).values_list('pk', *fields)
+        return {pk: tuple(values) for pk, *values in found}
+
+    def remap(self, record, **identity):
+        """Сохраняет record под новым id, если его id занят чужой записью.
+
+        Копию, сохранённую прошлой загрузкой, находим по identity.
+        """
+        model = type(record)
+        copies = model.objects.filter(**identity).order_by('-pk')
+        pk = copies.values_list('pk', flat=True).first()
+        if pk is None:
+            record.pk = None
+            model.objects.bulk_create([record])
+            # SQLite не возвращает id из bulk_create.
+            pk = copies.values_list('pk', flat=True).first()
+            self.remapped += 1
+        return pk
+
+    def load_posts(self, rows):
+        users = self.user_ids(rows, 'author')
+        existing = self.existing(Post, rows, 'author_id', 'pub_date')
+        posts = []
+        moved = []
+        for row in rows:
+            post = Post(
+                id=row['id'], author_id=users[row['author']],
+                group_id=self.groups.get(row['group']), text=row['text'],
+                pub_date=parse_datetime(row['pub_date']),
+                image=row['image'] or '',
+            )
+            identity = {'author_id': post.author_id,
+                        'pub_date': post.pub_date}
+            taken = existing.get(post.id)
+            if taken is None:
+                posts.append(post)
+            elif taken != tuple(identity.values()):
+                moved.append((row['id'], post, identity))
+            if row['image'] and self.media:
+                self.images.submit(row['image'])
+            self.touched.update((f'profile:{row["author"]}',
+                                 f'author:{users[row["author"]]}'))
+            if row['group']:
+                self.touched.add(f'group:{row["group"]}')
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+        # Новые id выдаются после пачки, чтобы не занять id из неё.
+        for old_id, post, identity in moved:
+            self.post_ids[old_id] = self.remap(post, **identity)
+
+    def load_comments(self, rows):
+        users = self.user_ids(rows, 'author')
+        existing = self.existing(
+            Comment, rows, 'post_id', 'author_id', 'created')
+        comments = []
+        moved = []
+        for row in rows:
+            comment = Comment(
+                id=row['id'],
+                post_id=self.post_ids.get(row['post'], row['post']),
+                author_id=users[row['author']], text=row['text'],
+                created=parse_datetime(row['created']))
+            identity = {'post_id': comment.post_id,
+                        'author_id': comment.author_id,
+                        'created': comment.created}
+            taken = existing.get(comment.id)
+            if taken is None:
+                comments.append(comment)
+            elif taken != tuple(identity.values()):
+                moved.append((comment, identity))
+        Comment.objects.bulk_create(comments, ignore_conflicts=True)
+        for comment, identity in moved:
+            self.remap(comment, **identity)
+        comments += [comment for comment, _ in moved]
+        if self.last_post_id is not None:
+            self.touched.update(
+                f'post:{comment.post_id}' for comment in comments
+                if comment.post_id <= self.last_post_id)
+
+    def load_follows(self, rows):
+        users = self.user_ids(rows, 'user', 'author')
+        Follow.objects.bulk_create([
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows if row['user'] != row['author']
+        ], ignore_conflicts=True)
+        self.touched.update(
+            f'profile:{row[field]}' for row in rows
+            for field in ('user', 'author'))
+
+    def reset_sequences(self):
+        # Явные id не сдвигают последовательности PostgreSQL.
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def rebuild_derived(self):
+        """Пересчитывает то, что bulk_create обходит мимо сигналов."""
+        reconcile_author_stats(self.batch_size)
+        reconcile_comment_counts(self.batch_size)
+        users = User.objects.filter(follower__isnull=False).distinct()
+        for user in users.iterator():
+            rebuild_timeline(user)
+        search.rebuild_index(self.batch_size)
+        touched = sorted(self.touched)
+        for start in range(0, len(touched), self.batch_size):
+            bump_versions(*touched[start:start + self.batch_size])
@@ -1,35 +1,62 @@
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse
-
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from django.utils.functional import SimpleLazyObject
 
+from core.ratelimit import rate_limit
+from core.sqlite import retry_if_locked
 
-def create_paginator(request, object):
-    paginator = Paginator(object, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+from .caches import get_feed_version
+from .counters import get_author_stats
+from .etags import (conditional, group_etag, index_etag, post_etag,
+                    profile_etag)
+from .forms import CommentForm, PostForm
+from .links import post_url
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator, WindowedPaginator, keyset_page
+from .search import search_posts
+from .timelines import TIMELINE_ORDER, timeline_posts
+from .writebehind import (comments_with_pending, delete_follow,
+                          is_following, save_comment, save_follow, settle)
+
+
+def create_paginator(request, object, count_key=None, **order):
+    paginator = CursorPaginator(
+        object, settings.POSTS_ON_PAGE, count_key=count_key, **order)
+    page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    if page_obj is None:
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@conditional(index_etag)
 def index(request):
-    posts = Post.objects.all()
-    page_obj = create_paginator(request, posts)
+    posts = Post.objects.for_feed()
+    # Лента главной кэшируется фрагментом: страница считается, только когда
+    # шаблон обратится к ней внутри {% cache %}, а при попадании в кэш
+    # ни COUNT, ни выборка постов не выполняются.
+    page_obj = SimpleLazyObject(
+        lambda: create_paginator(request, posts, 'posts:count:index'))
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
+        'feed_version': get_feed_version(),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional(group_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = create_paginator(request, posts)
+    posts = group.posts.for_feed()
+    page_obj = create_paginator(
+        request, posts, f'posts:count:group:{group.pk}')
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -37,37 +64,88 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional(profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = create_paginator(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    posts = author.posts.for_feed()
+    page_obj = create_paginator(
+        request, posts, f'posts:count:profile:{author.pk}')
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
+        following = is_following(request.user, author)
     else:
         following = False
     context = {
         'page_obj': page_obj,
         'author': author,
+        'author_stats': get_author_stats(author),
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comment_page(post_id, token=None):
+    """Комментарии поста после курсора с авторами одним JOIN.
+
+    Для битого курсора возвращает None.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return keyset_page(comments, settings.COMMENTS_ON_PAGE, token,
+                       key_field='created')
+
+
+@conditional(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'), id=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    token = request.GET.get('cursor')
+    comments, comments_cursor = (
+        comment_page(post.pk, token) or comment_page(post.pk))
+    if not token:
+        comments = comments_with_pending(comments, post.pk, request.user)
     context = {
         'post': post,
+        'author_stats': get_author_stats(post.author),
         'form': form,
         'comments': comments,
+        'comments_cursor': comments_cursor,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional(post_etag)
+def post_comments(request, post_id):
+    """Следующая пачка комментариев фрагментом HTML для подгрузки."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comment_page(post_id, request.GET.get('cursor'))
+    if page is None:
+        return HttpResponseBadRequest('Неверный курсор.')
+    comments, comments_cursor = page
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+        'comments_cursor': comments_cursor,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = WindowedPaginator(search_posts(query), settings.POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@rate_limit('post')
+@retry_if_locked
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -81,15 +159,16 @@ def post_create(request):
     post.author = request.user
     post.save()
 
-    return redirect('posts:profile', request.user.username)
+    return redirect(post_url('profile', request.user.username))
 
 
 @login_required
+@retry_if_locked
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
 
     if not request.user == post.author:
-        return redirect('posts:post_detail', post.id)
+        return redirect(post_url('post_detail', post.id))
 
     form = PostForm(
         request.POST or None,
@@ -102,10 +181,12 @@ def post_edit(request, post_id):
 
     form.save()
 
-    return redirect('posts:post_detail', post.id)
+    return redirect(post_url('post_detail', post.id))
 
 
 @login_required
+@rate_limit('comment')
+@retry_if_locked
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -113,32 +194,37 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
-    return redirect('posts:post_detail', post_id=post_id)
+        save_comment(comment)
+    return redirect(post_url('post_detail', post_id))
 
 
 @login_required
 def follow_index(request):
-    posts_following = Post.objects.filter(author__following__user=request.user)
-    page_obj = create_paginator(request, posts_following)
+    settle(request.user)
+    posts_following = timeline_posts(request.user)
+    page_obj = create_paginator(
+        request, posts_following, f'posts:count:follow:{request.user.pk}',
+        **TIMELINE_ORDER)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@rate_limit('follow', methods=('GET', 'POST'))
+@retry_if_locked
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
-    return redirect(reverse('posts:profile', args=[username]))
+        save_follow(user, author)
+    return redirect(post_url('profile', username))
 
 
 @login_required
+@rate_limit('follow', methods=('GET', 'POST'))
+@retry_if_locked
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    posts_follower = Follow.objects.filter(user=user, author=author)
-    if posts_follower.exists():
-        posts_follower.delete()
-    return redirect('posts:profile', username=author)
+    delete_follow(user, author)
+    return redirect(post_url('profile', author.username))
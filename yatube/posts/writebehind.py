@@ -0,0 +1,341 @@
+"""Отложенная запись комментариев и подписок пачками.
+
+С WRITE_BEHIND комментарий и подписка не пишутся в базу в запросе, а
+ложатся в очередь процесса. Фоновый поток раз в WRITE_BEHIND_INTERVAL
+секунд, или раньше, когда набралось WRITE_BEHIND_BATCH_SIZE записей,
+сохраняет их через bulk_create одной транзакцией: SQLite берёт блокировку
+на запись один раз на пачку, а не на каждый запрос.
+
+bulk_create не шлёт сигналы, поэтому счётчики, поиск, ленты и версии кэша
+обновляются здесь же, сразу для всей пачки. Свои несохранённые записи
+автор видит на странице поста и в профиле, их берут из очереди. Очередь
+живёт в памяти: при падении процесса несохранённое теряется, а при
+нескольких процессах автор видит свои записи только в том же процессе.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from . import counters, search, timelines
+from .caches import bump_versions
+from .models import Comment, Follow, Post, User
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.comments = []
+        self.follows = {}
+        # Отписки от подписок, которые уже ушли в базу со сброшенной пачкой.
+        self.unfollows = set()
+        # Пачка, которая сейчас пишется: до коммита её видно как очередь.
+        self.flushing = ([], {}, set())
+        # Неудачные сбросы подряд, после WRITE_BEHIND_RETRIES - по одной.
+        self.failures = 0
+        self.thread = None
+
+    def __len__(self):
+        return len(self.comments) + len(self.follows) + len(self.unfollows)
+
+    def add_comment(self, comment):
+        comment.created = timezone.now()
+        with self.lock:
+            self.comments.append(comment)
+        self.added()
+
+    def add_follow(self, follow):
+        pair = follow.user_id, follow.author_id
+        with self.lock:
+            self.unfollows.discard(pair)
+            self.follows[pair] = follow
+        self.added()
+
+    def discard_follow(self, user_id, author_id):
+        """Отменяет подписку из очереди, True - если она там была."""
+        pair = user_id, author_id
+        with self.lock:
+            queued = self.follows.pop(pair, None) is not None
+            if pair in self.flushing[1]:
+                # Подписка вот-вот окажется в базе: удалим её следующей пачкой.
+                self.unfollows.add(pair)
+                return True
+            return queued
+
+    def pending_comments(self, post_id, author_id):
+        """Несохранённые комментарии автора к посту, новые первыми."""
+        with self.lock:
+            comments = self.flushing[0] + self.comments
+        return [comment for comment in reversed(comments)
+                if comment.post_id == post_id
+                and comment.author_id == author_id]
+
+    def is_following(self, user_id, author_id):
+        """Подписка по очереди: True, False или None - очередь не знает."""
+        pair = user_id, author_id
+        with self.lock:
+            if pair in self.follows:
+                return True
+            if pair in self.unfollows or pair in self.flushing[2]:
+                return False
+            if pair in self.flushing[1]:
+                return True
+        return None
+
+    def has_follows(self, user_id):
+        """Есть ли в очереди подписки или отписки пользователя."""
+        with self.lock:
+            pairs = [*self.follows, *self.unfollows, *self.flushing[1],
+                     *self.flushing[2]]
+        return any(pair[0] == user_id for pair in pairs)
+
+    def added(self):
+        if len(self) >= settings.WRITE_BEHIND_BATCH_SIZE:
+            self.wakeup.set()
+        if self.thread is None and settings.WRITE_BEHIND_INTERVAL:
+            self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name='write-behind', daemon=True)
+            self.thread.start()
+        # При штатной остановке процесса очередь дописывается в базу.
+        atexit.register(self.drain)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.WRITE_BEHIND_INTERVAL)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Сохраняет накопленное, возвращает число сохранённых записей.
+
+        Несохранённая пачка возвращается в начало очереди, следующий сброс
+        пробует её снова. После WRITE_BEHIND_RETRIES неудач подряд записи
+        сохраняются по одной: запись, на которой падает не база
+        (OperationalError), а она сама, выбрасывается с ошибкой в журнале.
+        """
+        with self.flush_lock:
+            with self.lock:
+                self.flushing = (self.comments, self.follows, self.unfollows)
+                self.comments, self.follows, self.unfollows = [], {}, set()
+            comments, follows, unfollows = self.flushing
+            if not (comments or follows or unfollows):
+                return 0
+            if self.failures < settings.WRITE_BEHIND_RETRIES:
+                saved, failed = self.save_together(comments, follows,
+                                                   unfollows)
+            else:
+                saved, failed = self.save_apart(comments, follows, unfollows)
+            self.failures = self.failures + 1 if failed else 0
+            with self.lock:
+                if failed:
+                    self.requeue(*failed)
+                self.flushing = ([], {}, set())
+        return saved
+
+    def save_together(self, comments, follows, unfollows):
+        try:
+            return save_batch(comments, follows.values(), unfollows), None
+        except Exception:
+            logger.exception(
+                'Не удалось сохранить пачку: комментариев %s, подписок %s, '
+                'отписок %s', len(comments), len(follows), len(unfollows))
+            return 0, (comments, follows, unfollows)
+
+    def save_apart(self, comments, follows, unfollows):
+        saved = 0
+        failed = ([], {}, set())
+        rows = [((comment,), (), ()) for comment in comments]
+        rows += [((), (follow,), ()) for follow in follows.values()]
+        rows += [((), (), (pair,)) for pair in unfollows]
+        for index, row in enumerate(rows):
+            try:
+                saved += save_batch(*row)
+            except OperationalError:
+                # Блокировка или недоступная база - дело не в записи:
+                # она и все следующие ждут следующего сброса.
+                logger.exception('База недоступна для записи очереди')
+                for comments, follows, unfollows in rows[index:]:
+                    failed[0].extend(comments)
+                    failed[1].update(
+                        ((follow.user_id, follow.author_id), follow)
+                        for follow in follows)
+                    failed[2].update(unfollows)
+                break
+            except Exception:
+                logger.exception('Запись выброшена из очереди: %s', row)
+        return saved, failed if any(failed) else None
+
+    def requeue(self, comments, follows, unfollows):
+        """Возвращает несохранённое в начало очереди, свежее важнее."""
+        self.comments = comments + self.comments
+        # Подписка, отменённая во время сброса, так и не попала в базу.
+        cancelled = follows.keys() & self.unfollows
+        self.unfollows -= cancelled
+        self.follows = {
+            **{pair: follow for pair, follow in follows.items()
+               if pair not in cancelled},
+            **self.follows,
+        }
+        self.unfollows |= unfollows - self.follows.keys()
+
+    def drain(self):
+        """Сбрасывает очередь до конца, но не больше попыток, чем в flush."""
+        for _ in range(settings.WRITE_BEHIND_RETRIES + 2):
+            if not len(self):
+                return
+            self.flush()
+
+
+queue = WriteQueue()
+
+
+def save_batch(comments, follows, unfollows):
+    """Пачка одной транзакцией, возвращает число сохранённых записей.
+
+    Блокировку SQLite здесь не ждём: пачка возвращается в очередь и
+    повторяется следующим сбросом.
+    """
+    with transaction.atomic():
+        # Пост или пользователь могли удалить, пока запись ждала в очереди.
+        post_ids = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list('pk', flat=True))
+        user_ids = set(User.objects.filter(pk__in={
+            *(comment.author_id for comment in comments),
+            *(follow.user_id for follow in follows),
+            *(follow.author_id for follow in follows),
+        }).values_list('pk', flat=True))
+        delete_follows(unfollows)
+        return save_comments([
+            comment for comment in comments
+            if comment.post_id in post_ids and comment.author_id in user_ids
+        ]) + save_follows([
+            follow for follow in follows
+            if {follow.user_id, follow.author_id} <= user_ids
+        ])
+
+
+def save_comments(comments):
+    if not comments:
+        return 0
+    created = [comment.created for comment in comments]
+    Comment.objects.bulk_create(
+        comments, batch_size=settings.WRITE_BEHIND_BATCH_SIZE)
+    if comments[0].pk is None:
+        # SQLite не возвращает id из bulk_create. Запись в базу заперта
+        # до коммита, поэтому последние id - наши, по порядку вставки.
+        pks = Comment.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:len(comments)]
+        for comment, pk in zip(comments, reversed(list(pks))):
+            comment.pk = pk
+    # auto_now_add затёр время постановки в очередь, возвращаем его.
+    for comment, value in zip(comments, created):
+        comment.created = value
+    Comment.objects.bulk_update(
+        comments, ['created'], batch_size=settings.WRITE_BEHIND_BATCH_SIZE)
+    per_post = Counter(comment.post_id for comment in comments)
+    for post_id, count in per_post.items():
+        counters.change_comment_count(post_id, count)
+    search.index_comments(comments)
+    bump_versions('comments', *(f'post:{pk}' for pk in per_post))
+    return len(comments)
+
+
+def save_follows(follows):
+    existing = set(Follow.objects.filter(
+        user_id__in={follow.user_id for follow in follows},
+        author_id__in={follow.author_id for follow in follows},
+    ).values_list('user_id', 'author_id'))
+    follows = [follow for follow in follows
+               if (follow.user_id, follow.author_id) not in existing]
+    if not follows:
+        return 0
+    Follow.objects.bulk_create(
+        follows, batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+        ignore_conflicts=True)
+    deltas = Counter()
+    for follow in follows:
+        deltas[follow.author_id, 'followers_count'] += 1
+        deltas[follow.user_id, 'following_count'] += 1
+        timelines.add_author(follow.user, follow.author)
+    for (user_id, field), delta in deltas.items():
+        counters.change_author_stats(user_id, **{field: delta})
+    bump_versions(*{
+        f'profile:{user.username}'
+        for follow in follows for user in (follow.user, follow.author)
+    })
+    return len(follows)
+
+
+def delete_follows(pairs):
+    for user_id, author_id in pairs:
+        # delete() у выборки шлёт сигналы: счётчики и ленты поправятся.
+        Follow.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def save_comment(comment):
+    """Сохраняет комментарий сразу или ставит его в очередь."""
+    if not settings.WRITE_BEHIND:
+        comment.save()
+        return
+    queue.add_comment(comment)
+    # Автор не должен получить 304 на странице без своего комментария.
+    bump_versions(f'post:{comment.post_id}')
+
+
+def save_follow(user, author):
+    if not settings.WRITE_BEHIND:
+        Follow.objects.get_or_create(user=user, author=author)
+        return
+    queue.add_follow(Follow(user=user, author=author))
+    bump_versions(f'profile:{user.username}', f'profile:{author.username}')
+
+
+def delete_follow(user, author):
+    if queue.discard_follow(user.pk, author.pk):
+        bump_versions(f'profile:{user.username}',
+                      f'profile:{author.username}')
+    follows = Follow.objects.filter(user=user, author=author)
+    if follows.exists():
+        follows.delete()
+
+
+def is_following(user, author):
+    following = queue.is_following(user.pk, author.pk)
+    if following is not None:
+        return following
+    return Follow.objects.filter(user=user, author=author).exists()
+
+
+def settle(user):
+    """Дописывает очередь, если в ней подписки user.
+
+    Ленту подписок из очереди не собрать, поэтому перед её показом
+    подписчику его отложенные подписки сохраняются.
+    """
+    if settings.WRITE_BEHIND and queue.has_follows(user.pk):
+        queue.drain()
+
+
+def comments_with_pending(comments, post_id, user):
+    """Первая страница комментариев с несохранёнными комментариями user."""
+    if not settings.WRITE_BEHIND or not user.is_authenticated:
+        return comments
+    return queue.pending_comments(post_id, user.pk) + list(comments)
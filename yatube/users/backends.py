@@ -0,0 +1,63 @@
+"""Бэкенд авторизации с кэшем пользователей в памяти процесса.
+
+Пользователь хранится вместе с версией 'user:<pk>' из posts.caches:
+сохранение или удаление пользователя сдвигает версию, и следующий запрос
+читает его из базы заново. Проверка версии - одно чтение кэша вместо
+SELECT из auth_user на каждый запрос.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from posts.caches import get_versions
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def clear():
+    with _lock:
+        _users.clear()
+
+
+def _snapshot(user):
+    """Значения полей: из них каждый запрос собирает свой объект."""
+    return user._state.db, tuple(
+        getattr(user, field.attname) for field in user._meta.concrete_fields)
+
+
+def _restore(db, values):
+    UserModel = get_user_model()
+    names = [field.attname for field in UserModel._meta.concrete_fields]
+    return UserModel.from_db(db, names, values)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        version = get_versions(user_scope(user_id))[0]
+        now = time.monotonic()
+        with _lock:
+            cached = _users.get(user_id)
+            if cached and cached[0] == version and cached[1] > now:
+                _users.move_to_end(user_id)
+                return _restore(*cached[2])
+        user = super().get_user(user_id)
+        if user is None:
+            return None
+        # Срок жизни ограничивает устаревание, если кэш версий
+        # у каждого процесса свой.
+        expires = now + settings.USER_CACHE_TIMEOUT
+        with _lock:
+            _users[user_id] = (version, expires, _snapshot(user))
+            _users.move_to_end(user_id)
+            while len(_users) > settings.USER_CACHE_SIZE:
+                _users.popitem(last=False)
+        return user
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.caches import bump_versions
+
+from .backends import user_scope
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    # Смена пароля и правка профиля сбрасывают кэш пользователя.
+    bump_versions(user_scope(instance.pk))
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from users import backends
+
+User = get_user_model()
+
+
+class CachedUserTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        backends.clear()
+        self.user = User.objects.create_user(
+            username='auth', password='old-password', first_name='Имя')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.address = reverse('about:author')
+
+    def test_authenticated_hit_skips_session_and_user_queries(self):
+        self.client.get(self.address)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.address)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_password_change_logs_out(self):
+        self.client.get(self.address)
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(self.address)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_profile_edit_reloads_user(self):
+        backend = backends.CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Имя')
+        # update() обходит сигналы: версия не меняется, берётся кэш.
+        User.objects.filter(pk=self.user.pk).update(first_name='Без сигнала')
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Имя')
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertEqual(
+            backend.get_user(self.user.pk).first_name, 'Новое имя')
+
+    def test_each_request_gets_own_object(self):
+        backend = backends.CachedModelBackend()
+        first = backend.get_user(self.user.pk)
+        second = backend.get_user(self.user.pk)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertFalse(second._state.adding)
+
+    def test_deleted_user_not_returned(self):
+        backend = backends.CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.delete()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+
+class OldSessionTest(TestCase):
+    def test_session_of_model_backend_kept(self):
+        user = User.objects.create_user(username='auth')
+        client = Client()
+        client.force_login(
+            user, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get(reverse('about:author'))
+        self.assertEqual(response.wsgi_request.user, user)
@@ -0,0 +1,29 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with any ASGI server, e.g. ``uvicorn yatube.asgi:application``.
+
+Django 2.2 has no ASGI handler, so requests are passed to the WSGI handler
+in a thread pool (see core.asgi). Django 3.0+ provides its own handler.
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+try:
+    from django.core.asgi import get_asgi_application
+except ImportError:
+    from django.core.wsgi import get_wsgi_application
+
+    from core.asgi import WsgiToAsgi
+
+    application = WsgiToAsgi(get_wsgi_application())
+else:
+    application = get_asgi_application()
+
+from core.template_loaders import warm_up  # noqa: E402
+
+# Шаблоны компилируются до первого запроса, если включён их кэш.
+warm_up()
@@ -46,10 +46,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +68,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.MetricsDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,6 +83,20 @@ TEMPLATES = [
     },
 ]
 
+# Кэш скомпилированных шаблонов со встроенными include
+# (core.template_loaders): вне DEBUG или с YATUBE_TEMPLATE_CACHE=1.
+# Шаблоны компилируются заранее при старте yatube/wsgi.py и asgi.py.
+TEMPLATE_CACHE = os.environ.get(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1') == '1'
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('core.template_loaders.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -93,6 +110,41 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: YATUBE_DB_REPLICAS=2 добавит replica_1 и
+# replica_2 рядом с db.sqlite3, их файлы обновляет `manage.py sync_replicas`.
+# В тестах реплики смотрят в тестовую базу default.
+DATABASE_REPLICAS = [
+    f'replica_{i}'
+    for i in range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db_{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+# Выполняются для каждого нового соединения с SQLite (core.sqlite).
+# WAL не блокирует читателей на время записи, synchronous=NORMAL в WAL
+# не теряет целостность при сбое, cache_size в КиБ со знаком минус.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+# Повторы изменяющих view при 'database is locked': число и первая пауза.
+SQLITE_LOCK_RETRIES = 5
+SQLITE_LOCK_BACKOFF = 0.05
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает только с реплик, скопированных
+# после неё. Время записи хранится в cookie.
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = 10
+# На сколько секунд реплика может отставать от основной базы. Не больше
+# REPLICA_PIN_SECONDS, иначе клиент после cookie не увидит свою запись.
+REPLICA_MAX_LAG = REPLICA_PIN_SECONDS
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -132,12 +184,32 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 LOGIN_URL = 'users:login'
+# Сессия читается из кэша, в базу идёт только промах. Без базы вовсе:
+# YATUBE_SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies.
+SESSION_ENGINE = os.environ.get(
+    'YATUBE_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# Пользователь сессии берётся из кэша процесса (users.backends), запись
+# живёт не дольше USER_CACHE_TIMEOUT секунд. ModelBackend остаётся для
+# сессий, открытых до кэширующего бэкенда: без него их владельцы
+# оказались бы разлогинены.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_SIZE = 1000
+USER_CACHE_TIMEOUT = 60
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 POSTS_ON_PAGE = 10
+# Сколько адресов posts.links.post_url держит в памяти процесса.
+POST_URL_CACHE_SIZE = 10000
+COMMENTS_ON_PAGE = 20
+# Ленты длиннее порога считаются по кэшу, обновляемому раз в FEED_COUNT_TIMEOUT.
+FEED_EXACT_COUNT_LIMIT = 1000
+FEED_COUNT_TIMEOUT = 60
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
@@ -152,6 +224,85 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
+        'BACKEND': 'core.metrics.MetricsLocMemCache',
+    },
+    # Вёдра лимитов отдельно: вытеснение карточек и фрагментов не должно
+    # обнулять лимиты, а вёдра - вытеснять страницы.
+    'ratelimit': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Версии областей кэша (posts.caches). Истёкшая версия заводится заново с
+# другим значением, поэтому срок лишь освобождает кэш от забытых областей.
+CACHE_VERSION_TIMEOUT = 60 * 60 * 24
+# Фрагменты ленты сбрасываются сигналами при записи, TTL - страховка.
+FEED_CACHE_TIMEOUT = 60 * 5
+# Карточки постов меняют ключ при правке, TTL убирает старые версии.
+POST_CARD_TIMEOUT = 60 * 60
+
+# Лента подписок раздаётся подписчикам при записи поста. Посты авторов,
+# у которых подписчиков больше FEED_FANOUT_LIMIT, читаются напрямую.
+FEED_FANOUT_LIMIT = 1000
+FEED_FANOUT_BATCH_SIZE = 500
+FEED_BACKFILL_SIZE = 1000
+
+# Загрузки больше POST_IMAGE_MAX_SIZE байт отклоняются, остальные
+# уменьшаются до POST_IMAGE_MAX_DIMENSION и получают варианты для srcset.
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_DIMENSION = 2048
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+# Миниатюры постов строит `manage.py thumbnail_worker` из очереди в БД.
+THUMBNAIL_WORKERS = 2
+# Сколько секунд задача принадлежит взявшему её обработчику.
+THUMBNAIL_LEASE_SECONDS = 300
+# Первая пауза перед повтором после ошибки, дальше она удваивается.
+THUMBNAIL_RETRY_SECONDS = 60
+THUMBNAIL_MAX_ATTEMPTS = 5
+
+# Потоки, в которых yatube/asgi.py выполняет синхронные view Django 2.2.
+ASGI_THREADS = 8
+
+# Отложенная запись posts.writebehind: комментарии и подписки копятся в
+# памяти процесса и сохраняются пачками раз в WRITE_BEHIND_INTERVAL секунд
+# или по WRITE_BEHIND_BATCH_SIZE записей. Включается YATUBE_WRITE_BEHIND=1.
+# Без интервала фоновый поток не запускается, очередь сбрасывает flush().
+WRITE_BEHIND = os.environ.get('YATUBE_WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_INTERVAL = 0.5
+WRITE_BEHIND_BATCH_SIZE = 500
+# Сколько раз подряд пачка повторяется целиком, потом - по одной записи.
+WRITE_BEHIND_RETRIES = 3
+
+# Лимиты записи core.ratelimit, '<жетонов>/<период>' на пользователя и
+# на IP. Вёдра хранятся в кэше RATE_LIMIT_CACHE и живут не дольше
+# периода лимита; подписка и отписка тратят жетоны из одного ведра.
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMITS = {
+    'post': {'user': '10/m', 'ip': '30/m'},
+    'comment': {'user': '20/m', 'ip': '60/m'},
+    'follow': {'user': '30/m', 'ip': '90/m'},
+}
+
+# Пороги журнала медленных запросов core.middleware.RequestMetricsMiddleware.
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_QUERIES = 30
+SLOW_REQUEST_SQL_LIMIT = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
 }